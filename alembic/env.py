@@ -15,7 +15,7 @@ load_dotenv()
 
 # Import our models and database configuration
 from models.database import Base
-from models.models import Student, Attendance, Participation, Grade, Class, StudentClass, GradeCategory, SpecialPoints
+from models.models import Student, Attendance, Participation, Grade, Class, StudentClass, GradeCategory, SpecialPoints, Assignment, Submission, StudentGradeSummary, AuthSession
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
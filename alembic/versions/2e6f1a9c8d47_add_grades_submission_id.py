@@ -0,0 +1,60 @@
+"""Add grades.submission_id
+
+Revision ID: 2e6f1a9c8d47
+Revises: 9d4e7b2c1a53
+Create Date: 2026-10-17 21:05:31.774215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from models.models import GRADE_SUBMISSION_BACKFILL
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2e6f1a9c8d47'
+down_revision: Union[str, Sequence[str], None] = '9d4e7b2c1a53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NAME = 'unique_grade_submission'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    # submissions is created by create_all() at startup, after migrations, on
+    # a fresh database; the app then adds the column itself. It also does so
+    # on databases that were not migrated.
+    if 'submissions' not in inspector.get_table_names():
+        return
+    if 'submission_id' in {c['name'] for c in inspector.get_columns('grades')}:
+        return
+    with op.batch_alter_table('grades', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('submission_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            'fk_grades_submission_id', 'submissions', ['submission_id'], ['id'], ondelete='SET NULL',
+        )
+    op.execute(GRADE_SUBMISSION_BACKFILL)
+    with op.batch_alter_table('grades', schema=None) as batch_op:
+        batch_op.create_unique_constraint(NAME, ['submission_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if 'submission_id' not in {c['name'] for c in inspector.get_columns('grades')}:
+        return
+    indexes = {
+        i['name'] for i in inspector.get_indexes('grades')
+        if i['unique'] and not i.get('duplicates_constraint')
+    }
+    if NAME in indexes:
+        # Created by the app at startup rather than by upgrade()
+        op.drop_index(NAME, table_name='grades')
+    with op.batch_alter_table('grades', schema=None) as batch_op:
+        if NAME not in indexes:
+            batch_op.drop_constraint(NAME, type_='unique')
+        batch_op.drop_column('submission_id')
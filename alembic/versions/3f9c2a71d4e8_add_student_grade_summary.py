@@ -0,0 +1,47 @@
+"""Add student grade summary
+
+Revision ID: 3f9c2a71d4e8
+Revises: 6b303507af46
+Create Date: 2026-10-17 10:12:41.508213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2a71d4e8'
+down_revision: Union[str, Sequence[str], None] = '6b303507af46'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('student_grade_summary',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('student_id', sa.Integer(), nullable=False),
+        sa.Column('class_id', sa.Integer(), nullable=False),
+        sa.Column('category_averages', sa.JSON(), nullable=False),
+        sa.Column('average_grade', sa.Float(), nullable=False),
+        sa.Column('participation_points', sa.Integer(), nullable=False),
+        sa.Column('special_points_total', sa.Float(), nullable=False),
+        sa.Column('final_grade', sa.Float(), nullable=False),
+        sa.Column('last_activity', sa.Date(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['class_id'], ['classes.id'], ),
+        sa.ForeignKeyConstraint(['student_id'], ['students.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('student_id', 'class_id', name='unique_student_class_summary')
+    )
+    op.create_index(op.f('ix_student_grade_summary_id'), 'student_grade_summary', ['id'], unique=False)
+    op.create_index(op.f('ix_student_grade_summary_class_id'), 'student_grade_summary', ['class_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_student_grade_summary_class_id'), table_name='student_grade_summary')
+    op.drop_index(op.f('ix_student_grade_summary_id'), table_name='student_grade_summary')
+    op.drop_table('student_grade_summary')
@@ -0,0 +1,61 @@
+"""Add unique (student_id, class_id, date) to attendances
+
+Revision ID: 9d4e7b2c1a53
+Revises: f1c84d2a6e37
+Create Date: 2026-10-17 20:12:45.318402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4e7b2c1a53'
+down_revision: Union[str, Sequence[str], None] = 'f1c84d2a6e37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NAME = 'unique_student_class_date'
+
+
+def _exists() -> bool:
+    """The app creates the same unique index at startup on databases that
+    were not migrated."""
+    if op.get_context().as_sql:
+        return False
+    inspector = sa.inspect(op.get_bind())
+    names = {c['name'] for c in inspector.get_unique_constraints('attendances')}
+    names |= {i['name'] for i in inspector.get_indexes('attendances') if i['unique']}
+    return NAME in names
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if _exists():
+        return
+    # Roll calls used to look the row up and update the first match, so
+    # concurrent saves could leave duplicates; keep the oldest row.
+    op.execute(
+        "DELETE FROM attendances WHERE class_id IS NOT NULL AND id NOT IN ("
+        "SELECT MIN(id) FROM attendances WHERE class_id IS NOT NULL "
+        "GROUP BY student_id, class_id, date)"
+    )
+    with op.batch_alter_table('attendances', schema=None) as batch_op:
+        batch_op.create_unique_constraint(NAME, ['student_id', 'class_id', 'date'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    indexes = {
+        i['name'] for i in inspector.get_indexes('attendances')
+        if i['unique'] and not i.get('duplicates_constraint')
+    }
+    if NAME in indexes:
+        # Created by the app at startup rather than by upgrade()
+        op.drop_index(NAME, table_name='attendances')
+        return
+    with op.batch_alter_table('attendances', schema=None) as batch_op:
+        batch_op.drop_constraint(NAME, type_='unique')
@@ -0,0 +1,30 @@
+"""Add classes data_version
+
+Revision ID: a81d5e0c7b42
+Revises: 3f9c2a71d4e8
+Create Date: 2026-10-17 11:03:27.914530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a81d5e0c7b42'
+down_revision: Union[str, Sequence[str], None] = '3f9c2a71d4e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('classes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('classes', schema=None) as batch_op:
+        batch_op.drop_column('data_version')
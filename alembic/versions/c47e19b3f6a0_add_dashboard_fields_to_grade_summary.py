@@ -0,0 +1,40 @@
+"""Add dashboard fields to student grade summary
+
+Revision ID: c47e19b3f6a0
+Revises: a81d5e0c7b42
+Create Date: 2026-10-17 11:48:05.227194
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47e19b3f6a0'
+down_revision: Union[str, Sequence[str], None] = 'a81d5e0c7b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('student_grade_summary', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('participation_pending', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('attendance_present', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('attendance_total', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('attendance_rate', sa.Float(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('status', sa.String(length=20), nullable=False, server_default='at_risk'))
+    # Summaries are derived data: drop them so they are rebuilt with the new fields
+    op.execute("DELETE FROM student_grade_summary")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('student_grade_summary', schema=None) as batch_op:
+        batch_op.drop_column('status')
+        batch_op.drop_column('attendance_rate')
+        batch_op.drop_column('attendance_total')
+        batch_op.drop_column('attendance_present')
+        batch_op.drop_column('participation_pending')
@@ -0,0 +1,36 @@
+"""Add auth sessions
+
+Revision ID: d2b86f4a9e15
+Revises: c47e19b3f6a0
+Create Date: 2026-10-17 14:20:05.318842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2b86f4a9e15'
+down_revision: Union[str, Sequence[str], None] = 'c47e19b3f6a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('auth_sessions',
+        sa.Column('token_hash', sa.String(length=64), nullable=False),
+        sa.Column('student_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['student_id'], ['students.id'], ),
+        sa.PrimaryKeyConstraint('token_hash')
+    )
+    op.create_index(op.f('ix_auth_sessions_student_id'), 'auth_sessions', ['student_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_auth_sessions_student_id'), table_name='auth_sessions')
+    op.drop_table('auth_sessions')
@@ -0,0 +1,34 @@
+"""Add auth sessions last_seen_at
+
+Revision ID: e5a3c9d71b20
+Revises: d2b86f4a9e15
+Create Date: 2026-10-17 16:02:44.170391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a3c9d71b20'
+down_revision: Union[str, Sequence[str], None] = 'd2b86f4a9e15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('auth_sessions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_seen_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_auth_sessions_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_auth_sessions_last_seen_at'), ['last_seen_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('auth_sessions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_auth_sessions_last_seen_at'))
+        batch_op.drop_index(batch_op.f('ix_auth_sessions_created_at'))
+        batch_op.drop_column('last_seen_at')
@@ -0,0 +1,62 @@
+"""Add composite indexes for hot filters
+
+Revision ID: f1c84d2a6e37
+Revises: e5a3c9d71b20
+Create Date: 2026-10-17 18:40:12.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c84d2a6e37'
+down_revision: Union[str, Sequence[str], None] = 'e5a3c9d71b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, columns). class_id leads the per-student indexes so
+# they also serve the class-wide queries of the dashboard and grade engine.
+INDEXES = [
+    ('ix_attendances_class_student', 'attendances', ['class_id', 'student_id']),
+    ('ix_grades_class_student', 'grades', ['class_id', 'student_id']),
+    ('ix_participations_class_student', 'participations', ['class_id', 'student_id']),
+    ('ix_participations_class_approved', 'participations', ['class_id', 'approved']),
+    ('ix_submissions_assignment_grade', 'submissions', ['assignment_id', 'grade']),
+    ('ix_assignments_class_published_due', 'assignments', ['class_id', 'published', 'due_date']),
+]
+
+
+def _existing_tables() -> set:
+    """Tables present now; assignments and submissions are created by
+    create_all() at startup, after migrations, on a fresh database."""
+    if op.get_context().as_sql:
+        return {table for _, table, _ in INDEXES}
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tables = _existing_tables()
+    # CREATE INDEX CONCURRENTLY does not lock writes on Postgres but cannot
+    # run inside a transaction. if_not_exists lets a failed run be retried.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            if table not in tables:
+                continue
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_concurrently=True, if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    tables = _existing_tables()
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            if table not in tables:
+                continue
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
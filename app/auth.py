@@ -3,22 +3,67 @@ Google OAuth authentication module.
 Verifies Google ID tokens and manages session tokens.
 """
 import os
-import secrets
+from datetime import datetime
+from typing import NamedTuple, Optional
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from google.oauth2 import id_token
-from google.auth.transport import requests
-from sqlalchemy.orm import Session
+from google.auth.exceptions import TransportError
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
 from models.database import get_db
 from models.models import Student, Class, StudentClass
+from app.cache import TTLCache
+from app.session_store import build_session_store
+from app.google_certs import GoogleCertCache, verify_google_id_token
 
 security = HTTPBearer(auto_error=False)
 
-# In-memory session store: session_token -> student_id
-sessions: dict[str, int] = {}
+# Session store: session_token -> student_id (backend chosen by SESSION_BACKEND)
+session_store = build_session_store()
 
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 
+# Google's signing certificates, shared across logins
+google_certs = GoogleCertCache()
+
+
+class Principal(NamedTuple):
+    """Column values of an authenticated student, enough to serve a request."""
+    id: int
+    name: str
+    email: str
+    role: str
+    oauth_id: Optional[str]
+    created_at: Optional[datetime]
+
+
+# student_id -> Principal. Skips the Student lookup for repeat requests. The
+# token itself is checked with the session store on every request, so
+# logouts, expiry and idle tracking are exact. ORM updates and deletes of a
+# Student drop its entry (in this worker); bulk update()/delete() on
+# students must call invalidate_student(), other workers see the change
+# within the TTL.
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "60")),
+)
+
+
+class TeacherStudents(NamedTuple):
+    """Authorization index entry: a teacher's classes and their students."""
+    class_ids: frozenset
+    student_ids: frozenset
+
+
+# teacher_id -> TeacherStudents, for X-Impersonate checks. Entries are
+# dropped (after commit) when an enrollment or class they cover changes or
+# the teacher creates a class; bulk statements on enrollments or classes
+# clear the whole index.
+teacher_students_index = TTLCache(
+    maxsize=256,
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "60")),
+)
+
 
 def verify_google_token(token: str) -> dict:
     """
@@ -32,9 +77,7 @@ def verify_google_token(token: str) -> dict:
         )
 
     try:
-        idinfo = id_token.verify_oauth2_token(
-            token, requests.Request(), GOOGLE_CLIENT_ID
-        )
+        idinfo = verify_google_id_token(token, GOOGLE_CLIENT_ID, google_certs)
         return idinfo
     except ValueError as e:
         raise HTTPException(
@@ -42,6 +85,12 @@ def verify_google_token(token: str) -> dict:
             detail=f"Invalid Google token: {str(e)}",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    except TransportError as e:
+        # Google's certificate endpoint is down, not the token's fault
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Could not verify Google token, try again later: {str(e)}",
+        )
 
 
 TEACHER_EMAIL = os.getenv("TEACHER_EMAIL")
@@ -87,35 +136,112 @@ def find_or_create_student(db: Session, google_info: dict) -> Student:
     return student
 
 
-def create_session(student_id: int) -> str:
+def create_session(student_id: int, role: str = "student") -> str:
     """Create a new session token for a student."""
-    token = secrets.token_urlsafe(32)
-    sessions[token] = student_id
-    return token
+    return session_store.create(student_id, role)
 
 
 def delete_session(token: str) -> bool:
     """Delete a session token. Returns True if it existed."""
-    return sessions.pop(token, None) is not None
+    return session_store.delete(token)
 
 
-async def get_current_student(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> Student:
-    """
-    Get the current authenticated student from the session token.
-    """
-    if not credentials:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+def lookup_session(token: str) -> Optional[int]:
+    """Return the student id for a session token, or None if it is not valid."""
+    return session_store.get(token)
+
 
-    token = credentials.credentials
-    student_id = sessions.get(token)
+def invalidate_student(student_id: int) -> None:
+    """Drop the cached principal of a student (deleted, or role/profile changed)."""
+    principal_cache.discard(student_id)
 
+
+@event.listens_for(Student, "after_update")
+@event.listens_for(Student, "after_delete")
+def _student_changed(mapper, connection, target):
+    invalidate_student(target.id)
+
+
+def teacher_student_ids(teacher_id: int, db: Session, refresh: bool = False) -> frozenset:
+    """Ids of students enrolled in any class of the teacher (one query on a
+    miss, or when refresh is set)."""
+    entry = None if refresh else teacher_students_index.get(teacher_id)
+    if entry is None:
+        rows = db.execute(
+            select(Class.id, StudentClass.student_id).outerjoin(
+                StudentClass, StudentClass.class_id == Class.id
+            ).where(Class.teacher_id == teacher_id)
+        ).all()
+        entry = TeacherStudents(
+            class_ids=frozenset(cid for cid, _ in rows),
+            student_ids=frozenset(sid for _, sid in rows if sid is not None),
+        )
+        teacher_students_index.set(teacher_id, entry)
+    return entry.student_ids
+
+
+@event.listens_for(StudentClass, "after_insert")
+@event.listens_for(StudentClass, "after_delete")
+@event.listens_for(Class, "after_delete")
+def _enrollment_changed(mapper, connection, target):
+    class_id = target.class_id if isinstance(target, StudentClass) else target.id
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_class_ids", set()).add(class_id)
+
+
+@event.listens_for(Class, "after_insert")
+def _class_created(mapper, connection, target):
+    # The class is not in the teacher's cached class_ids yet, so its
+    # enrollments would not match the entry: drop it by teacher instead
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("new_class_teacher_ids", set()).add(target.teacher_id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bulk_enrollment_change(orm_execute_state):
+    # Bulk statements skip the mapper events above. Bulk updates of classes
+    # (data_version bumps on every write) do not change membership.
+    if orm_execute_state.is_select:
+        return
+    mapped = {m.class_ for m in orm_execute_state.all_mappers}
+    if StudentClass in mapped or (Class in mapped and not orm_execute_state.is_update):
+        orm_execute_state.session.info["teacher_students_stale"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_stale_teacher_students(session):
+    if session.info.pop("teacher_students_stale", False):
+        teacher_students_index.clear()
+    for teacher_id in session.info.pop("new_class_teacher_ids", ()):
+        teacher_students_index.discard(teacher_id)
+    changed = session.info.pop("changed_class_ids", None)
+    if changed:
+        teacher_students_index.discard_where(lambda entry: not entry.class_ids.isdisjoint(changed))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_classes(session):
+    session.info.pop("changed_class_ids", None)
+    session.info.pop("new_class_teacher_ids", None)
+    session.info.pop("teacher_students_stale", None)
+
+
+def _attach_principal(principal: Principal, db: Session) -> Student:
+    """Student for a cached principal, attached to db without a query."""
+    student = Student(**principal._asdict())
+    make_transient_to_detached(student)
+    return db.merge(student, load=False)
+
+
+def _resolve_token(token: str, db: Session) -> Student:
+    """Student for a session token, from the principal cache when possible.
+
+    The token is validated by the session store first, every time; only the
+    Student row is cached.
+    """
+    student_id = lookup_session(token)
     if student_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -123,7 +249,11 @@ async def get_current_student(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    student = db.query(Student).filter(Student.id == student_id).first()
+    principal = principal_cache.get(student_id)
+    if principal is not None:
+        return _attach_principal(principal, db)
+
+    student = db.get(Student, student_id)
     if not student:
         # Student was deleted, clean up session
         delete_session(token)
@@ -133,19 +263,25 @@ async def get_current_student(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    principal_cache.set(student.id, Principal(
+        id=student.id, name=student.name, email=student.email, role=student.role,
+        oauth_id=student.oauth_id, created_at=student.created_at,
+    ))
     return student
 
 
-async def get_student_or_impersonated(
-    request: Request,
+def get_current_student(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db),
 ) -> Student:
     """
-    Get the current student, or an impersonated student if the caller is a teacher
-    sending the X-Impersonate header with a student ID.
+    Get the current authenticated student from the session token.
+
+    A plain def, so FastAPI runs it in the threadpool: the session store and
+    Student lookups are blocking calls and must not run on the event loop.
+    The Student is bound to the request's sync Session, the same one the
+    route gets from get_db.
     """
-    # First, resolve the caller normally
     if not credentials:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -153,25 +289,30 @@ async def get_student_or_impersonated(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    token = credentials.credentials
-    student_id = sessions.get(token)
+    return _resolve_token(credentials.credentials, db)
 
-    if student_id is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired session token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
 
-    caller = db.query(Student).filter(Student.id == student_id).first()
-    if not caller:
-        delete_session(token)
+def get_student_or_impersonated(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db),
+) -> Student:
+    """
+    Get the current student, or an impersonated student if the caller is a teacher
+    sending the X-Impersonate header with a student ID.
+
+    Runs in the threadpool, like get_current_student.
+    """
+    # First, resolve the caller normally
+    if not credentials:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Student not found",
+            detail="Not authenticated",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    caller = _resolve_token(credentials.credentials, db)
+
     # Check for impersonation header
     impersonate_id = request.headers.get("X-Impersonate")
     if not impersonate_id:
@@ -192,21 +333,21 @@ async def get_student_or_impersonated(
             detail="Invalid X-Impersonate value",
         )
 
-    target = db.query(Student).filter(Student.id == target_id).first()
+    # Verify the teacher owns a class where the target student is enrolled.
+    # The index may predate an enrollment made in another worker, so a
+    # negative answer is checked once more against the database.
+    enrolled = (
+        target_id in teacher_student_ids(caller.id, db)
+        or target_id in teacher_student_ids(caller.id, db, refresh=True)
+    )
+
+    target = db.get(Student, target_id)
     if not target:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Impersonation target not found",
         )
-
-    # Verify the teacher owns a class where the target student is enrolled
-    teacher_class_ids = db.query(Class.id).filter(Class.teacher_id == caller.id).subquery()
-    enrollment = db.query(StudentClass).filter(
-        StudentClass.student_id == target_id,
-        StudentClass.class_id.in_(teacher_class_ids),
-    ).first()
-
-    if not enrollment:
+    if not enrolled:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Target student is not enrolled in any of your classes",
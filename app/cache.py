@@ -0,0 +1,147 @@
+"""
+Class-versioned caches.
+Every write that touches a class bumps classes.data_version in the same
+transaction. Cached values are stored with the version they were computed
+at, so a version mismatch is a miss and no explicit eviction is needed.
+
+TTLCache covers data with no version to compare against (e.g. auth
+principals): entries expire after a fixed time and are evicted explicitly.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from models.models import Class
+
+
+def class_version_bump(class_id: int):
+    """UPDATE statement that bumps a class version, for sync or async sessions."""
+    return update(Class).where(Class.id == class_id).values(
+        data_version=Class.data_version + 1
+    ).execution_options(synchronize_session=False)
+
+
+def bump_class_version(db: Session, class_id: int) -> None:
+    """Invalidate cached data for a class. Call before the write's commit."""
+    db.execute(class_version_bump(class_id))
+
+
+def class_version(class_: Class) -> tuple:
+    """Version stamp of a loaded class row.
+
+    The class code is included so a reused id (SQLite reuses the highest
+    rowid after a delete) never matches an entry cached for the old class.
+    """
+    return (class_.data_version or 0, class_.code)
+
+
+class ClassVersionCache:
+    """Thread-safe LRU of values keyed by class id plus an optional sub-key."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, class_id: int, version: tuple, key: Hashable = None) -> Optional[Any]:
+        """Return the cached value if it was stored at this version."""
+        with self._lock:
+            entry = self._data.get((class_id, key))
+            if entry is None or entry[0] != version:
+                return None
+            self._data.move_to_end((class_id, key))
+            return entry[1]
+
+    def set(self, class_id: int, version: tuple, value: Any, key: Hashable = None) -> None:
+        """Store a value computed at the given version."""
+        with self._lock:
+            self._data[(class_id, key)] = (version, value)
+            self._data.move_to_end((class_id, key))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, class_id: int) -> None:
+        """Drop every entry for a class (e.g. when the class is deleted)."""
+        with self._lock:
+            for k in [k for k in self._data if k[0] == class_id]:
+                del self._data[k]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class TTLCache:
+    """Thread-safe LRU whose entries expire ttl seconds after being stored.
+
+    Counts hits, misses and evictions for monitoring.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def discard_where(self, predicate: Callable[[Any], bool]) -> None:
+        """Drop every entry whose value matches predicate."""
+        with self._lock:
+            for k in [k for k, (_, v) in self._data.items() if predicate(v)]:
+                del self._data[k]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+# Class-wide dashboard stats and recent activity
+dashboard_cache = ClassVersionCache()
+
+# Loaded gradebooks for what-if simulations
+simulation_cache = ClassVersionCache(maxsize=32)
@@ -0,0 +1,128 @@
+"""
+Google ID token verification with cached signing certificates.
+id_token.verify_oauth2_token downloads Google's certificates on every call.
+GoogleCertCache keeps them for the max-age the endpoint sends, refreshes
+them in a background thread shortly before they expire, and refetches
+immediately when a token is signed with a key it has not seen (rotation).
+Login then costs only the local signature check.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+from google.auth import exceptions, jwt
+from google.auth.transport import requests
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+# Used when the response carries no Cache-Control max-age
+DEFAULT_MAX_AGE = 3600
+# Start a background refresh this many seconds before the certs expire
+REFRESH_MARGIN = 300
+# Unknown key ids trigger a refetch at most this often
+MIN_FORCED_REFRESH_INTERVAL = 60
+# After a failed background refresh, wait this long before the next one
+REFRESH_RETRY_INTERVAL = 30
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class GoogleCertCache:
+    """Key id -> PEM certificate map, shared by every request of a worker."""
+
+    def __init__(self, url: str = GOOGLE_CERTS_URL, refresh_margin: float = REFRESH_MARGIN):
+        self.url = url
+        self.refresh_margin = refresh_margin
+        self._request = requests.Request()
+        self._certs: Optional[dict] = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._fetched_at = float("-inf")
+        self._lock = threading.Lock()
+        # Guards _refreshing; _lock is held for the whole fetch
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+        self.fetches = 0
+
+    def _fetch(self) -> None:
+        response = self._request(self.url, method="GET")
+        if response.status != 200:
+            raise exceptions.TransportError(f"Could not fetch certificates at {self.url}")
+        match = _MAX_AGE_RE.search(response.headers.get("cache-control", ""))
+        max_age = int(match.group(1)) if match else DEFAULT_MAX_AGE
+        try:
+            certs = json.loads(response.data.decode("utf-8"))
+        except ValueError as e:
+            raise exceptions.TransportError(f"Invalid certificates response from {self.url}") from e
+        self._certs = certs
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + max_age
+        self._refresh_at = self._fetched_at + max(max_age - self.refresh_margin, max_age / 2)
+        self.fetches += 1
+
+    def _background_refresh(self) -> None:
+        try:
+            with self._lock:
+                self._fetch()
+        except Exception as e:
+            # The current certs stay in use until they expire; back off so
+            # every login does not start another request while Google fails
+            with self._lock:
+                self._refresh_at = time.monotonic() + REFRESH_RETRY_INTERVAL
+            logger.warning(f"Google certs refresh failed: {e}")
+        finally:
+            with self._refresh_lock:
+                self._refreshing = False
+
+    def get(self, force_refresh: bool = False) -> dict:
+        """Current certificates, fetching only when missing or expired.
+
+        force_refresh refetches unless the last fetch was very recent, so
+        tokens with made-up key ids cannot hammer the endpoint.
+        """
+        def stale(now: float) -> bool:
+            return (
+                self._certs is None
+                or now >= self._expires_at
+                or (force_refresh and now - self._fetched_at >= MIN_FORCED_REFRESH_INTERVAL)
+            )
+
+        now = time.monotonic()
+        if stale(now):
+            with self._lock:
+                # Concurrent logins wait for one fetch instead of each doing their own
+                if stale(time.monotonic()):
+                    self._fetch()
+                return self._certs
+        if now >= self._refresh_at:
+            with self._refresh_lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(target=self._background_refresh, daemon=True).start()
+        return self._certs
+
+
+def verify_google_id_token(token: str, audience: str, certs: GoogleCertCache) -> dict:
+    """Decode and verify a Google ID token against cached certificates.
+
+    Same checks as id_token.verify_oauth2_token (signature, expiry,
+    audience, issuer). Raises ValueError when verification fails, and
+    google.auth.exceptions.TransportError when the certificates cannot be
+    fetched.
+    """
+    kid = jwt.decode_header(token).get("kid")
+    current = certs.get()
+    if kid not in current:
+        current = certs.get(force_refresh=True)
+    idinfo = jwt.decode(token, certs=current, audience=audience)
+    if idinfo.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError(f"Wrong issuer. 'iss' should be one of: {', '.join(GOOGLE_ISSUERS)}")
+    return idinfo
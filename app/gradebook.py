@@ -0,0 +1,250 @@
+"""
+Vectorized gradebook.
+Loads a class into dense NumPy arrays (students × grade items) so category
+averages, weighted sums and final grades are computed for the whole class
+at once instead of one student at a time.
+"""
+from collections import defaultdict
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models.models import Grade, GradeCategory, Participation, SpecialPoints, StudentClass
+
+# Final grade points per approved participation point
+PARTICIPATION_FACTOR = 0.1
+
+
+class Gradebook:
+    """Dense grade matrices for one class.
+
+    Attributes:
+        student_ids: row order of every per-student array.
+        category_ids / weights: one entry per grade category (C).
+        scores / max_scores: S × I matrices, NaN where a student has no grade
+            in that item column.
+        category_index: length-I vector mapping each item column to its
+            category position, or -1 when the grade is uncategorized.
+        participation: approved participation points per student.
+        special_points: awarded special points total per student.
+        participation_factor: final grade points per participation point.
+    """
+
+    def __init__(
+        self,
+        student_ids: list[int],
+        category_ids: list[int],
+        weights: np.ndarray,
+        scores: np.ndarray,
+        max_scores: np.ndarray,
+        category_index: np.ndarray,
+        participation: np.ndarray,
+        special_points: np.ndarray,
+        participation_factor: float = PARTICIPATION_FACTOR,
+    ):
+        self.student_ids = student_ids
+        self.category_ids = category_ids
+        self.weights = weights
+        self.scores = scores
+        self.max_scores = max_scores
+        self.category_index = category_index
+        self.participation = participation
+        self.special_points = special_points
+        self.participation_factor = participation_factor
+        self._row = {sid: i for i, sid in enumerate(student_ids)}
+
+    @classmethod
+    def from_rows(
+        cls,
+        student_ids: Iterable[int],
+        categories: Iterable[tuple],
+        grade_rows: Iterable[tuple],
+        participation: Optional[dict] = None,
+        special_points: Optional[dict] = None,
+    ) -> "Gradebook":
+        """Build from plain rows.
+
+        categories: (category_id, weight) pairs.
+        grade_rows: (student_id, category_id, name, score, max_score) tuples.
+            Each distinct (category_id, name) becomes an item column; a
+            student's repeated grades under the same key get extra columns so
+            no grade is dropped.
+        participation / special_points: student_id -> total.
+        """
+        student_ids = list(student_ids)
+        row = {sid: i for i, sid in enumerate(student_ids)}
+        categories = list(categories)
+        category_ids = [cid for cid, _ in categories]
+        cat_pos = {cid: i for i, cid in enumerate(category_ids)}
+
+        columns = {}
+        occurrences = defaultdict(int)
+        cells = []
+        for sid, cat_id, name, score, max_score in grade_rows:
+            if sid not in row:
+                continue
+            base = (cat_id, name)
+            key = (cat_id, name, occurrences[(sid, base)])
+            occurrences[(sid, base)] += 1
+            col = columns.setdefault(key, len(columns))
+            cells.append((row[sid], col, score, max_score))
+
+        shape = (len(student_ids), len(columns))
+        scores = np.full(shape, np.nan)
+        max_scores = np.full(shape, np.nan)
+        if cells:
+            r, c, s, m = (np.array(v) for v in zip(*cells))
+            scores[r.astype(int), c.astype(int)] = s
+            max_scores[r.astype(int), c.astype(int)] = m
+
+        category_index = np.full(len(columns), -1, dtype=int)
+        for (cat_id, _, _), col in columns.items():
+            category_index[col] = cat_pos.get(cat_id, -1)
+
+        participation = participation or {}
+        special_points = special_points or {}
+        return cls(
+            student_ids=student_ids,
+            category_ids=category_ids,
+            weights=np.array([w for _, w in categories], dtype=float),
+            scores=scores,
+            max_scores=max_scores,
+            category_index=category_index,
+            participation=np.array([int(participation.get(sid) or 0) for sid in student_ids], dtype=float),
+            special_points=np.array([float(special_points.get(sid) or 0) for sid in student_ids], dtype=float),
+        )
+
+    @classmethod
+    def load(
+        cls,
+        class_id: int,
+        db: Session,
+        student_ids: Optional[Iterable[int]] = None,
+    ) -> "Gradebook":
+        """Load a class (or a subset of its students) with four column queries."""
+        if student_ids is None:
+            student_ids = [
+                sid for (sid,) in db.query(StudentClass.student_id).filter(
+                    StudentClass.class_id == class_id
+                ).order_by(StudentClass.id).all()
+            ]
+        student_ids = list(student_ids)
+
+        categories = db.query(GradeCategory.id, GradeCategory.weight).filter(
+            GradeCategory.class_id == class_id
+        ).order_by(GradeCategory.id).all()
+
+        grade_rows = db.query(
+            Grade.student_id, Grade.category_id, Grade.name, Grade.score, Grade.max_score,
+        ).filter(
+            Grade.class_id == class_id,
+            Grade.student_id.in_(student_ids),
+        ).order_by(Grade.id).all()
+
+        participation = dict(
+            db.query(Participation.student_id, func.sum(Participation.points)).filter(
+                Participation.class_id == class_id,
+                Participation.student_id.in_(student_ids),
+                Participation.approved == "approved",
+            ).group_by(Participation.student_id).all()
+        )
+
+        special_points = dict(
+            db.query(SpecialPoints.student_id, func.sum(SpecialPoints.points_value)).filter(
+                SpecialPoints.class_id == class_id,
+                SpecialPoints.student_id.in_(student_ids),
+                SpecialPoints.opted_in == True,
+                SpecialPoints.awarded == True,
+            ).group_by(SpecialPoints.student_id).all()
+        )
+
+        return cls.from_rows(student_ids, categories, grade_rows, participation, special_points)
+
+    def with_changes(
+        self,
+        weights: Optional[dict] = None,
+        extra_items: Iterable[tuple] = (),
+        participation_factor: Optional[float] = None,
+    ) -> "Gradebook":
+        """Return a copy with hypothetical changes applied; self is untouched.
+
+        weights: category_id -> new weight.
+        extra_items: (category_id, score, max_score, student_ids) tuples, each
+            added as a new item column; student_ids=None gives it to everyone.
+        participation_factor: replaces the points-per-participation factor.
+        """
+        new_weights = self.weights.copy()
+        pos = {cid: i for i, cid in enumerate(self.category_ids)}
+        for cid, w in (weights or {}).items():
+            new_weights[pos[cid]] = w
+
+        extra_items = list(extra_items)
+        n = len(self.student_ids)
+        scores = np.full((n, len(extra_items)), np.nan)
+        max_scores = np.full((n, len(extra_items)), np.nan)
+        category_index = np.full(len(extra_items), -1, dtype=int)
+        for col, (cid, score, max_score, student_ids) in enumerate(extra_items):
+            rows = (
+                slice(None) if student_ids is None
+                else [self._row[sid] for sid in student_ids if sid in self._row]
+            )
+            scores[rows, col] = score
+            max_scores[rows, col] = max_score
+            category_index[col] = pos.get(cid, -1)
+
+        return Gradebook(
+            student_ids=self.student_ids,
+            category_ids=self.category_ids,
+            weights=new_weights,
+            scores=np.hstack([self.scores, scores]),
+            max_scores=np.hstack([self.max_scores, max_scores]),
+            category_index=np.concatenate([self.category_index, category_index]),
+            participation=self.participation,
+            special_points=self.special_points,
+            participation_factor=(
+                self.participation_factor if participation_factor is None
+                else participation_factor
+            ),
+        )
+
+    def row(self, student_id: int) -> int:
+        """Row index of a student in the per-student arrays."""
+        return self._row[student_id]
+
+    def _percentages(self) -> tuple[np.ndarray, np.ndarray]:
+        """Per-cell score percentage and validity mask (grade present, max_score > 0)."""
+        with np.errstate(invalid="ignore"):
+            valid = ~np.isnan(self.scores) & (np.nan_to_num(self.max_scores) > 0)
+        pct = np.zeros_like(self.scores)
+        np.divide(self.scores, self.max_scores, out=pct, where=valid)
+        return pct * 100, valid
+
+    def category_averages(self) -> np.ndarray:
+        """S × C matrix of category average percentages (0 when no grades)."""
+        pct, valid = self._percentages()
+        onehot = (self.category_index[:, None] == np.arange(len(self.category_ids))[None, :]).astype(float)
+        sums = pct @ onehot
+        counts = valid.astype(float) @ onehot
+        return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+    def average_grades(self) -> np.ndarray:
+        """Unweighted average percentage over all valid grades per student."""
+        pct, valid = self._percentages()
+        counts = valid.sum(axis=1).astype(float)
+        return np.divide(pct.sum(axis=1), counts, out=np.zeros(len(self.student_ids)), where=counts > 0)
+
+    def weighted_sums(self) -> np.ndarray:
+        """Σ(category_avg × weight); simple average when the class has no categories."""
+        if not self.category_ids:
+            return self.average_grades()
+        return self.category_averages() @ self.weights
+
+    def final_grades(self) -> np.ndarray:
+        """Σ(category_avg × weight) + (participation × factor) + special_points."""
+        return (
+            self.weighted_sums()
+            + self.participation_factor * self.participation
+            + self.special_points
+        )
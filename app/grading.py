@@ -0,0 +1,369 @@
+"""
+Grade calculation service.
+Computes grade breakdowns for every student in a class with a fixed number
+of grouped queries instead of one round of queries per student, memoizes
+them per class data version, and keeps the materialized
+student_grade_summary rows in sync with them.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import case, func, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from models.database import dialect_insert
+from models.models import (
+    Grade, GradeCategory, Participation, SpecialPoints, Assignment, Submission,
+    StudentClass, Attendance, StudentGradeSummary,
+)
+from models.schemas import CategoryGradeBreakdown, GradeResponse, SpecialPointsResponse
+from app.cache import ClassVersionCache
+from app.gradebook import Gradebook
+
+# Breakdowns per (class_id, student_id), valid for one class data version
+grade_cache = ClassVersionCache(maxsize=4096)
+
+
+def calc_class_grades(
+    class_id: int,
+    db: Session,
+    student_ids: Optional[Iterable[int]] = None,
+) -> dict[int, dict]:
+    """Calculate grades for all students in a class (or the given subset).
+
+    Formula: Σ(category_avg × weight) + (participation × 0.1) + special_points
+
+    Returns a map of student_id -> breakdown dict with the same keys the
+    per-student calculation has always returned.
+    """
+    if student_ids is None:
+        student_ids = [
+            sid for (sid,) in db.query(StudentClass.student_id).filter(
+                StudentClass.class_id == class_id
+            ).all()
+        ]
+    student_ids = list(student_ids)
+    if not student_ids:
+        return {}
+
+    # 1. Categories for this class
+    categories = db.query(GradeCategory).filter(
+        GradeCategory.class_id == class_id
+    ).all()
+
+    # 2. All grades for these students
+    grades_by_student = defaultdict(list)
+    for g in db.query(Grade).filter(
+        Grade.class_id == class_id,
+        Grade.student_id.in_(student_ids),
+    ).order_by(Grade.student_id, Grade.id).all():
+        grades_by_student[g.student_id].append(g)
+
+    # 3. Published assignment totals per category
+    total_by_cat = dict(
+        db.query(Assignment.category_id, func.count(Assignment.id)).filter(
+            Assignment.class_id == class_id,
+            Assignment.published == True,
+        ).group_by(Assignment.category_id).all()
+    )
+
+    # 4. Graded / pending submission counts per student and category
+    sub_counts = {}
+    rows = db.query(
+        Submission.student_id,
+        Assignment.category_id,
+        func.count(Submission.grade),
+        func.sum(case((Submission.grade.is_(None), 1), else_=0)),
+    ).join(Assignment, Submission.assignment_id == Assignment.id).filter(
+        Assignment.class_id == class_id,
+        Assignment.published == True,
+        Submission.student_id.in_(student_ids),
+    ).group_by(Submission.student_id, Assignment.category_id).all()
+    for sid, cat_id, graded, pending in rows:
+        sub_counts[(sid, cat_id)] = (int(graded or 0), int(pending or 0))
+
+    # 5. Approved participation points per student
+    part_by_student = dict(
+        db.query(Participation.student_id, func.sum(Participation.points)).filter(
+            Participation.class_id == class_id,
+            Participation.student_id.in_(student_ids),
+            Participation.approved == "approved",
+        ).group_by(Participation.student_id).all()
+    )
+
+    # 6. Special points per student
+    sp_by_student = defaultdict(list)
+    for sp in db.query(SpecialPoints).filter(
+        SpecialPoints.class_id == class_id,
+        SpecialPoints.student_id.in_(student_ids),
+    ).order_by(SpecialPoints.id).all():
+        sp_by_student[sp.student_id].append(sp)
+
+    # Grade math for the whole class at once
+    gradebook = Gradebook.from_rows(
+        student_ids,
+        [(cat.id, cat.weight) for cat in categories],
+        [
+            (g.student_id, g.category_id, g.name, g.score, g.max_score)
+            for grades in grades_by_student.values() for g in grades
+        ],
+        part_by_student,
+        {
+            sid: sum(sp.points_value for sp in sps if sp.opted_in and sp.awarded)
+            for sid, sps in sp_by_student.items()
+        },
+    )
+    category_averages = gradebook.category_averages()
+    average_grades = gradebook.average_grades()
+    final_grades = gradebook.final_grades()
+
+    results = {}
+    for student_id in student_ids:
+        i = gradebook.row(student_id)
+        all_grades = grades_by_student.get(student_id, [])
+
+        category_breakdowns = []
+        for j, cat in enumerate(categories):
+            cat_grades = [g for g in all_grades if g.category_id == cat.id]
+            avg = float(category_averages[i, j])
+
+            graded_count, pending_count = sub_counts.get((student_id, cat.id), (0, 0))
+            category_breakdowns.append(CategoryGradeBreakdown(
+                category_id=cat.id,
+                category_name=cat.name,
+                weight=cat.weight,
+                grades=[GradeResponse(
+                    id=g.id, student_id=g.student_id, category_id=g.category_id,
+                    category=g.category, name=g.name, score=g.score,
+                    max_score=g.max_score, date=g.date,
+                ) for g in cat_grades],
+                average=avg,
+                weighted_contribution=avg * cat.weight,
+                graded_count=graded_count,
+                pending_count=pending_count,
+                total_assignments=total_by_cat.get(cat.id, 0),
+            ))
+
+        # Participation bonus (no cap)
+        part_pts = int(gradebook.participation[i])
+
+        results[student_id] = {
+            # Simple average for display (without weights)
+            "average_grade": float(average_grades[i]),
+            "participation_points": part_pts,
+            "participation_contribution": 0.1 * part_pts,
+            "special_points": [SpecialPointsResponse(
+                id=sp.id, student_id=sp.student_id, class_id=sp.class_id,
+                category=sp.category, opted_in=sp.opted_in, awarded=sp.awarded,
+                points_value=sp.points_value, created_at=sp.created_at,
+            ) for sp in sp_by_student.get(student_id, [])],
+            "special_points_total": float(gradebook.special_points[i]),
+            "category_breakdowns": category_breakdowns,
+            "final_grade": float(final_grades[i]),
+        }
+
+    return results
+
+
+def get_grade_calculations(
+    class_id: int,
+    db: Session,
+    student_ids: Iterable[int],
+    version: tuple,
+) -> dict[int, dict]:
+    """Memoized calc_class_grades.
+
+    version is the class stamp from app.cache.class_version; every write
+    that can change a grade bumps it, so a stored result is reused only
+    while nothing in the class has changed. Misses are computed together
+    in one batch.
+    """
+    student_ids = list(student_ids)
+    results = {}
+    missing = []
+    for sid in student_ids:
+        cached = grade_cache.get(class_id, version, key=sid)
+        if cached is None:
+            missing.append(sid)
+        else:
+            results[sid] = cached
+    if missing:
+        for sid, gd in calc_class_grades(class_id, db, missing).items():
+            grade_cache.set(class_id, version, gd, key=sid)
+            results[sid] = gd
+    return results
+
+
+def calc_activity_stats(
+    class_id: int,
+    db: Session,
+    student_ids: Optional[Iterable[int]] = None,
+) -> dict[int, dict]:
+    """Attendance, participation and last-activity metrics per student.
+
+    One UNION ALL over attendances, participations and grades grouped by
+    student, instead of separate row scans, sums and MAX(date) queries per
+    student. Without student_ids every student with activity in the class
+    is returned.
+    """
+    present = case((Attendance.status.in_(("present", "late")), 1), else_=0)
+    att = select(
+        Attendance.student_id.label("student_id"),
+        literal(1).label("att_total"),
+        present.label("att_present"),
+        literal(0).label("part_points"),
+        literal(0).label("part_pending"),
+        Attendance.date.label("activity_date"),
+    ).where(Attendance.class_id == class_id)
+    part = select(
+        Participation.student_id,
+        literal(0),
+        literal(0),
+        case((Participation.approved == "approved", Participation.points), else_=0),
+        case((Participation.approved == "pending", 1), else_=0),
+        Participation.date,
+    ).where(Participation.class_id == class_id)
+    grd = select(
+        Grade.student_id, literal(0), literal(0), literal(0), literal(0), Grade.date,
+    ).where(Grade.class_id == class_id)
+    if student_ids is not None:
+        student_ids = list(student_ids)
+        att = att.where(Attendance.student_id.in_(student_ids))
+        part = part.where(Participation.student_id.in_(student_ids))
+        grd = grd.where(Grade.student_id.in_(student_ids))
+
+    activity = union_all(att, part, grd).subquery()
+    rows = db.execute(
+        select(
+            activity.c.student_id,
+            func.sum(activity.c.att_total),
+            func.sum(activity.c.att_present),
+            func.sum(activity.c.part_points),
+            func.sum(activity.c.part_pending),
+            func.max(activity.c.activity_date),
+        ).group_by(activity.c.student_id)
+    ).all()
+
+    stats = {}
+    for sid, att_total, att_present, part_points, part_pending, last in rows:
+        att_total = int(att_total or 0)
+        att_present = int(att_present or 0)
+        stats[sid] = {
+            "attendance_total": att_total,
+            "attendance_present": att_present,
+            "attendance_rate": (att_present / att_total * 100) if att_total > 0 else 0.0,
+            "participation_points": int(part_points or 0),
+            "participation_pending": int(part_pending or 0),
+            "last_activity": last,
+        }
+    return stats
+
+
+EMPTY_ACTIVITY = {
+    "attendance_total": 0,
+    "attendance_present": 0,
+    "attendance_rate": 0.0,
+    "participation_points": 0,
+    "participation_pending": 0,
+    "last_activity": None,
+}
+
+
+def student_status(attendance_rate: float, final_grade: float) -> str:
+    """Dashboard status: at_risk, warning or good."""
+    if attendance_rate < 60 or final_grade < 60:
+        return "at_risk"
+    if attendance_rate < 80 or final_grade < 70:
+        return "warning"
+    return "good"
+
+
+def refresh_grade_summaries(
+    class_id: int,
+    db: Session,
+    student_ids: Optional[Iterable[int]] = None,
+) -> dict[int, dict]:
+    """Recompute and upsert summary rows for a class (or some of its students).
+
+    Pending changes are flushed first so the new values include them. All
+    rows are written with one INSERT ... ON CONFLICT (student_id, class_id)
+    DO UPDATE, so two requests creating the same rows do not collide. The
+    caller owns the transaction and commits together with its own write.
+    Returns the written column values per student id.
+    """
+    db.flush()
+    if student_ids is None:
+        student_ids = [
+            sid for (sid,) in db.query(StudentClass.student_id).filter(
+                StudentClass.class_id == class_id
+            ).all()
+        ]
+    student_ids = list(set(student_ids))
+    if not student_ids:
+        return {}
+
+    grades = calc_class_grades(class_id, db, student_ids)
+    activity = calc_activity_stats(class_id, db, student_ids)
+    now = datetime.utcnow()
+
+    summaries = {}
+    for student_id, gd in grades.items():
+        act = activity.get(student_id, EMPTY_ACTIVITY)
+        summaries[student_id] = {
+            "student_id": student_id,
+            "class_id": class_id,
+            "category_averages": {
+                str(cb.category_id): cb.average for cb in gd["category_breakdowns"]
+            },
+            "average_grade": gd["average_grade"],
+            "participation_points": gd["participation_points"],
+            "special_points_total": gd["special_points_total"],
+            "final_grade": gd["final_grade"],
+            "participation_pending": act["participation_pending"],
+            "attendance_present": act["attendance_present"],
+            "attendance_total": act["attendance_total"],
+            "attendance_rate": act["attendance_rate"],
+            "status": student_status(act["attendance_rate"], gd["final_grade"]),
+            "last_activity": act["last_activity"],
+            "updated_at": now,
+        }
+    if not summaries:
+        return {}
+
+    stmt = dialect_insert(db, StudentGradeSummary).values(list(summaries.values()))
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["student_id", "class_id"],
+        set_={
+            col: stmt.excluded[col]
+            for col in next(iter(summaries.values()))
+            if col not in ("student_id", "class_id")
+        },
+    ))
+    return summaries
+
+
+def ensure_grade_summaries(class_id: int, db: Session) -> int:
+    """Create summary rows for enrolled students that do not have one yet.
+
+    Finds them with one outer join; returns how many were created. Read
+    paths call this on every request, so when nothing is missing it is that
+    one query and no write. Created rows are committed right away, once,
+    so call it before making other changes in the session. The upsert
+    tolerates a concurrent request creating the same rows. Writes to a
+    class keep its rows current.
+    """
+    missing = [
+        sid for (sid,) in db.query(StudentClass.student_id).outerjoin(
+            StudentGradeSummary,
+            (StudentGradeSummary.student_id == StudentClass.student_id)
+            & (StudentGradeSummary.class_id == StudentClass.class_id),
+        ).filter(
+            StudentClass.class_id == class_id,
+            StudentGradeSummary.id.is_(None),
+        ).all()
+    ]
+    if missing:
+        refresh_grade_summaries(class_id, db, missing)
+        db.commit()
+    return len(missing)
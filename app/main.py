@@ -3,16 +3,24 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 from sqlalchemy import inspect, text
-from models.database import Base, engine
+from models.database import Base, engine, get_async_engine
 # Import all models to ensure they are registered with Base.metadata
-from models.models import Student, Attendance, Participation, Grade, Class, StudentClass, GradeCategory, SpecialPoints, Assignment, Submission
+from models.models import Student, Attendance, Participation, Grade, Class, StudentClass, GradeCategory, SpecialPoints, Assignment, Submission, StudentGradeSummary, AuthSession, RevokedToken, GRADE_SUBMISSION_BACKFILL
 from routes import health, students, participation, auth, admin, classes
+from app.auth import session_store
+from app.query_stats import QueryStatsMiddleware, instrument
+
+logger = logging.getLogger(__name__)
+
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
 
 
 def _ensure_columns():
@@ -31,6 +39,57 @@ def _ensure_columns():
                 conn.execute(text(
                     "ALTER TABLE grades ADD COLUMN name VARCHAR(200)"
                 ))
+            if "submission_id" not in existing_cols:
+                conn.execute(text(
+                    "ALTER TABLE grades ADD COLUMN submission_id INTEGER "
+                    "REFERENCES submissions(id) ON DELETE SET NULL"
+                ))
+                conn.execute(text(GRADE_SUBMISSION_BACKFILL))
+
+        unique = {c["name"] for c in inspector.get_unique_constraints("grades")}
+        unique |= {i["name"] for i in inspector.get_indexes("grades") if i["unique"]}
+        if "unique_grade_submission" not in unique:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    "CREATE UNIQUE INDEX unique_grade_submission ON grades (submission_id)"
+                ))
+
+    if "classes" in inspector.get_table_names():
+        existing_cols = {col["name"] for col in inspector.get_columns("classes")}
+
+        with engine.begin() as conn:
+            if "data_version" not in existing_cols:
+                conn.execute(text(
+                    "ALTER TABLE classes ADD COLUMN data_version INTEGER DEFAULT 0 NOT NULL"
+                ))
+
+    if "student_grade_summary" in inspector.get_table_names():
+        existing_cols = {col["name"] for col in inspector.get_columns("student_grade_summary")}
+
+        with engine.begin() as conn:
+            for col, ddl in (
+                ("participation_pending", "INTEGER DEFAULT 0 NOT NULL"),
+                ("attendance_present", "INTEGER DEFAULT 0 NOT NULL"),
+                ("attendance_total", "INTEGER DEFAULT 0 NOT NULL"),
+                ("attendance_rate", "FLOAT DEFAULT 0 NOT NULL"),
+                ("status", "VARCHAR(20) DEFAULT 'at_risk' NOT NULL"),
+            ):
+                if col not in existing_cols:
+                    conn.execute(text(
+                        f"ALTER TABLE student_grade_summary ADD COLUMN {col} {ddl}"
+                    ))
+                    # Derived data: reads recompute missing rows, writes and
+                    # scripts/rebuild_grade_summaries.py persist them again
+                    conn.execute(text("DELETE FROM student_grade_summary"))
+
+    if "auth_sessions" in inspector.get_table_names():
+        existing_cols = {col["name"] for col in inspector.get_columns("auth_sessions")}
+
+        with engine.begin() as conn:
+            if "last_seen_at" not in existing_cols:
+                conn.execute(text(
+                    "ALTER TABLE auth_sessions ADD COLUMN last_seen_at TIMESTAMP"
+                ))
 
     if "submissions" in inspector.get_table_names():
         existing_cols = {col["name"] for col in inspector.get_columns("submissions")}
@@ -45,6 +104,34 @@ def _ensure_columns():
                     "ALTER TABLE submissions ADD COLUMN penalty_pct INTEGER DEFAULT 100 NOT NULL"
                 ))
 
+    if "attendances" in inspector.get_table_names():
+        unique = {c["name"] for c in inspector.get_unique_constraints("attendances")}
+        unique |= {i["name"] for i in inspector.get_indexes("attendances") if i["unique"]}
+
+        if "unique_student_class_date" not in unique:
+            with engine.begin() as conn:
+                # The roll call upserts on (student_id, class_id, date). Drop
+                # duplicates first, keeping the row it used to update (the oldest).
+                conn.execute(text(
+                    "DELETE FROM attendances WHERE class_id IS NOT NULL AND id NOT IN ("
+                    "SELECT MIN(id) FROM attendances WHERE class_id IS NOT NULL "
+                    "GROUP BY student_id, class_id, date)"
+                ))
+                conn.execute(text(
+                    "CREATE UNIQUE INDEX unique_student_class_date "
+                    "ON attendances (student_id, class_id, date)"
+                ))
+
+
+async def _sweep_sessions():
+    """Periodically remove expired sessions (in a thread: stores may do I/O)."""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        try:
+            await asyncio.to_thread(session_store.sweep)
+        except Exception as e:
+            logger.error(f"Session sweep failed: {e}", exc_info=True)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -52,8 +139,10 @@ async def lifespan(app: FastAPI):
     # creates tables that don't already exist, never drops or modifies existing ones.
     Base.metadata.create_all(bind=engine)
     _ensure_columns()
+    sweeper = asyncio.create_task(_sweep_sessions())
     yield
-    # Shutdown: cleanup if needed
+    # Shutdown: stop the session sweeper
+    sweeper.cancel()
 
 
 app = FastAPI(
@@ -73,6 +162,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Statement counts and DB time per request (X-DB-Queries, Server-Timing)
+instrument(engine, get_async_engine().sync_engine)
+app.add_middleware(QueryStatsMiddleware)
+
 # Include routers (before static files to ensure API routes take precedence)
 app.include_router(health.router)
 app.include_router(students.router)
@@ -0,0 +1,141 @@
+"""
+Class ownership checks for teacher routes.
+Admin handlers used to start with a query that loads the class filtered by
+teacher_id, and assignment handlers with a second one for the assignment's
+class. The dependencies below load the class, or the assignment or
+submission together with its class, and compare teacher_id on that row.
+They are plain def, so FastAPI runs their queries in the threadpool.
+
+Handlers that only have a class_id call owns_class(), backed by a
+per-worker teacher_id -> owned class ids map that answers without a query.
+The map is dropped after a commit that creates or deletes a class, but a
+class deleted in another worker stays in it until the TTL, and SQLite
+reuses the id of the highest deleted row for the next class, which may
+belong to another teacher. Writes pass for_write=True to check the class
+row even on a hit; reads accept that window (PRINCIPAL_CACHE_TTL).
+"""
+import os
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload, object_session
+
+from models.database import get_db
+from models.models import Assignment, Class, Student, Submission
+from app.auth import get_current_teacher
+from app.cache import TTLCache
+
+# teacher_id -> frozenset of owned class ids
+teacher_classes = TTLCache(
+    maxsize=256,
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "60")),
+)
+
+
+def owned_class_ids(teacher_id: int, db: Session) -> frozenset:
+    """Ids of the teacher's classes (one query on a miss)."""
+    class_ids = teacher_classes.get(teacher_id)
+    if class_ids is None:
+        class_ids = frozenset(
+            cid for (cid,) in db.query(Class.id).filter(Class.teacher_id == teacher_id)
+        )
+        teacher_classes.set(teacher_id, class_ids)
+    return class_ids
+
+
+def owns_class(teacher_id: int, class_id: int, db: Session, for_write: bool = False) -> bool:
+    """Whether the teacher owns the class; no query when the map is warm,
+    unless for_write, which always checks Class.teacher_id."""
+    cached = class_id in owned_class_ids(teacher_id, db)
+    if cached and not for_write:
+        return True
+    owned = db.query(Class.id).filter(
+        Class.id == class_id,
+        Class.teacher_id == teacher_id,
+    ).first() is not None
+    if owned != cached:
+        # Created or deleted since the entry was cached (e.g. by another worker)
+        teacher_classes.discard(teacher_id)
+    return owned
+
+
+@event.listens_for(Class, "after_insert")
+@event.listens_for(Class, "after_delete")
+def _class_created_or_deleted(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_owned_classes", set()).add((target.teacher_id, target.id))
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_stale_teacher_classes(session):
+    changed = session.info.pop("changed_owned_classes", None)
+    if changed:
+        class_ids = {class_id for _, class_id in changed}
+        for teacher_id, _ in changed:
+            teacher_classes.discard(teacher_id)
+        # A new class may reuse the id of one deleted from another teacher
+        teacher_classes.discard_where(lambda owned: not owned.isdisjoint(class_ids))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_teachers(session):
+    session.info.pop("changed_owned_classes", None)
+
+
+def get_owned_class(
+    class_id: int,
+    teacher: Student = Depends(get_current_teacher),
+    db: Session = Depends(get_db),
+) -> Class:
+    """Dependency: the teacher's class, loaded by primary key, else 404."""
+    class_ = db.get(Class, class_id)
+    if class_ is None or class_.teacher_id != teacher.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Clase no encontrada",
+        )
+    return class_
+
+
+def get_owned_assignment(
+    assignment_id: int,
+    teacher: Student = Depends(get_current_teacher),
+    db: Session = Depends(get_db),
+) -> Assignment:
+    """Dependency: an assignment, with its class loaded in the same query,
+    in one of the teacher's classes.
+
+    404 if it does not exist, 403 if it belongs to another teacher.
+    """
+    assignment = db.query(Assignment).options(
+        joinedload(Assignment.class_)
+    ).filter(Assignment.id == assignment_id).first()
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Reto no encontrado")
+    if assignment.class_ is None or assignment.class_.teacher_id != teacher.id:
+        raise HTTPException(status_code=403, detail="No tienes permiso")
+    return assignment
+
+
+def get_owned_submission(
+    submission_id: int,
+    teacher: Student = Depends(get_current_teacher),
+    db: Session = Depends(get_db),
+) -> Submission:
+    """Dependency: a submission, with its assignment and class loaded in the
+    same query, to an assignment in one of the teacher's classes.
+
+    404 if either does not exist, 403 if it belongs to another teacher.
+    """
+    submission = db.query(Submission).options(
+        joinedload(Submission.assignment).joinedload(Assignment.class_)
+    ).filter(Submission.id == submission_id).first()
+    if not submission:
+        raise HTTPException(status_code=404, detail="Entrega no encontrada")
+    if not submission.assignment:
+        raise HTTPException(status_code=404, detail="Reto no encontrado")
+    class_ = submission.assignment.class_
+    if class_ is None or class_.teacher_id != teacher.id:
+        raise HTTPException(status_code=403, detail="No tienes permiso")
+    return submission
@@ -0,0 +1,256 @@
+"""
+Per-request SQL statement counting and process-wide statement latencies.
+Cursor events on both engines time every statement. While a request is
+being served, its statements are added to a RequestQueries object held
+in a context variable (copied into threadpool workers and run_sync
+greenlets along with the rest of the request context).
+QueryStatsMiddleware reports the totals in the X-DB-Queries and
+Server-Timing response headers. A statement shape that repeats more than
+QUERY_REPEAT_THRESHOLD times in one request (an N+1 loop) is logged once
+with the application line that issued it.
+
+StatementStats keeps recent latencies per statement shape and a ring
+buffer of slow statements (parameter values redacted) for the
+/api/debug/queries endpoint.
+"""
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from functools import lru_cache
+from collections import Counter, OrderedDict, deque
+from datetime import datetime, timezone
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "10"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "100"))
+# Shapes tracked (least recently run dropped first) and latencies kept per shape
+QUERY_STATS_MAX_SHAPES = 500
+QUERY_STATS_SAMPLES = 1000
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_WHITESPACE_RE = re.compile(r"\s+")
+_IN_LIST_RE = re.compile(r"\(\s*(?:\?|%\(\w+\)s|\$\d+)(?:\s*,\s*(?:\?|%\(\w+\)s|\$\d+))*\s*\)")
+_NUMBER_RE = re.compile(r"\b\d+\b")
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement: str) -> str:
+    """Statement with whitespace collapsed and bound lists and numbers folded.
+
+    Two executions of the same query with different parameters (or a
+    different number of IN values) have the same shape. Cached: SQLAlchemy
+    reuses the compiled SQL string of each query.
+    """
+    shape = _WHITESPACE_RE.sub(" ", statement).strip()
+    shape = _IN_LIST_RE.sub("(?)", shape)
+    return _NUMBER_RE.sub("N", shape)
+
+
+def _call_site() -> str:
+    """Innermost application frame outside this module (file:line in function)."""
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith("<"):
+            continue
+        path = os.path.abspath(frame.filename)
+        if (
+            path.startswith(_PROJECT_ROOT)
+            and path != os.path.abspath(__file__)
+            and "site-packages" not in path
+        ):
+            return f"{os.path.relpath(path, _PROJECT_ROOT)}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+
+class RequestQueries:
+    """Statement count, DB time and shapes seen by one request."""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Counter = Counter()
+        self._warned: set = set()
+        self._lock = threading.Lock()
+
+    def record(self, shape: str, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            self.shapes[shape] += 1
+            repeated = self.shapes[shape] > QUERY_REPEAT_THRESHOLD and shape not in self._warned
+            if repeated:
+                self._warned.add(shape)
+        if repeated:
+            logger.warning(
+                f"Possible N+1 in {self.label}: statement repeated more than "
+                f"{QUERY_REPEAT_THRESHOLD} times at {_call_site()}: {shape[:200]}"
+            )
+
+
+def _percentile(ordered: list, q: float) -> float:
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)] if ordered else 0.0
+
+
+def _redact(parameters) -> list:
+    """Type names in place of bound values (they may hold emails or tokens)."""
+    if isinstance(parameters, dict):
+        values = parameters.values()
+    elif isinstance(parameters, (list, tuple)):
+        values = parameters
+    else:
+        return []
+    return [f"<{type(v).__name__}>" for v in values]
+
+
+class StatementStats:
+    """Call counts and rolling latency samples per statement shape, plus a
+    ring buffer of the most recent slow statements."""
+
+    def __init__(
+        self,
+        max_shapes: int = QUERY_STATS_MAX_SHAPES,
+        samples: int = QUERY_STATS_SAMPLES,
+        slow_ms: float = SLOW_QUERY_MS,
+        slow_log_size: int = SLOW_QUERY_LOG_SIZE,
+    ):
+        self.max_shapes = max_shapes
+        self.samples = samples
+        self.slow_ms = slow_ms
+        self._shapes: OrderedDict = OrderedDict()  # shape -> [count, total, deque]
+        self._slow: deque = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+
+    def record(self, shape: str, seconds: float, parameters, request: Optional[str]) -> None:
+        with self._lock:
+            entry = self._shapes.get(shape)
+            if entry is None:
+                entry = self._shapes[shape] = [0, 0.0, deque(maxlen=self.samples)]
+                if len(self._shapes) > self.max_shapes:
+                    self._shapes.popitem(last=False)
+            else:
+                self._shapes.move_to_end(shape)
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2].append(seconds)
+        if seconds * 1000 >= self.slow_ms:
+            slow = {
+                "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "duration_ms": round(seconds * 1000, 2),
+                "statement": shape,
+                "parameters": _redact(parameters),
+                "request": request,
+                "call_site": _call_site(),
+            }
+            with self._lock:
+                self._slow.append(slow)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._shapes.clear()
+            self._slow.clear()
+
+    def stats(self, limit: int = 50) -> dict:
+        """Shapes by total time (percentiles over the recent samples) and slow log, newest first."""
+        with self._lock:
+            shapes = [
+                (shape, count, total, sorted(recent))
+                for shape, (count, total, recent) in self._shapes.items()
+            ]
+            slow = list(reversed(self._slow))
+        shapes.sort(key=lambda s: s[2], reverse=True)
+        return {
+            "tracked_statements": len(shapes),
+            "slow_threshold_ms": self.slow_ms,
+            "statements": [
+                {
+                    "statement": shape,
+                    "calls": count,
+                    "total_ms": round(total * 1000, 2),
+                    "mean_ms": round(total / count * 1000, 3),
+                    "p50_ms": round(_percentile(recent, 0.50) * 1000, 3),
+                    "p95_ms": round(_percentile(recent, 0.95) * 1000, 3),
+                    "p99_ms": round(_percentile(recent, 0.99) * 1000, 3),
+                    "max_recent_ms": round(recent[-1] * 1000, 3),
+                }
+                for shape, count, total, recent in shapes[:limit]
+            ],
+            "slow_queries": slow,
+        }
+
+
+statement_stats = StatementStats()
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+def current_queries() -> Optional[RequestQueries]:
+    """Stats of the request being served, or None outside a request."""
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    shape = statement_shape(statement)
+    stats = _current.get()
+    if stats is not None:
+        stats.record(shape, elapsed)
+    statement_stats.record(shape, elapsed, parameters, stats.label if stats else None)
+
+
+def _handle_error(context):
+    # after_cursor_execute does not run for a failed statement
+    starts = context.connection.info.get("query_start") if context.connection else None
+    if starts:
+        starts.pop()
+
+
+def instrument(*engines) -> None:
+    """Time statements on these (sync) engines; pass get_async_engine().sync_engine."""
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware adding X-DB-Queries and Server-Timing to HTTP responses."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueries(f"{scope['method']} {scope['path']}")
+        token = _current.set(stats)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.count).encode()))
+                headers.append((
+                    b"server-timing",
+                    f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"'.encode(),
+                ))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
@@ -0,0 +1,494 @@
+"""
+Session token storage.
+Maps session tokens to student ids behind one small interface so the backend
+can be chosen per deployment with SESSION_BACKEND:
+
+  memory    in-process dict (default; single worker, lost on restart)
+  database  auth_sessions table in the app database (shared by every worker
+            and replica)
+  kv        local SQLite key-value file at SESSION_KV_PATH (shared by the
+            workers of one node)
+  signed    HMAC-signed tokens carrying student id, role and expiry; any
+            worker verifies them with SECRET_KEY, logouts are recorded in
+            the revoked_tokens table of the app database
+
+The persistent backends key rows by the SHA-256 of the token, so a leaked
+table does not hand out live tokens, and every lookup is one primary-key read.
+
+Sessions expire SESSION_MAX_AGE seconds after login and after
+SESSION_IDLE_TIMEOUT seconds without use. Expired sessions are rejected on
+lookup and removed in batches by sweep(), which the app runs periodically
+(see app.main). Stores that hold state also keep at most SESSION_MAX_COUNT
+sessions, evicting the oldest first.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import func, true
+
+from models.database import SessionLocal, dialect_insert
+from models.models import AuthSession, RevokedToken
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_KV_PATH = os.getenv("SESSION_KV_PATH", "./sessions.kv")
+SESSION_MAX_AGE = int(os.getenv("SESSION_MAX_AGE", str(7 * 24 * 3600)))
+SESSION_IDLE_TIMEOUT = int(os.getenv("SESSION_IDLE_TIMEOUT", str(24 * 3600)))
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "10000"))
+SECRET_KEY = os.getenv("SECRET_KEY", "")
+
+# Persistent stores record use at most this often per session
+TOUCH_INTERVAL = 60
+SWEEP_BATCH_SIZE = 500
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _utc(ts: float) -> datetime:
+    """Epoch seconds as the naive UTC datetimes stored in the database."""
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None)
+
+
+class SessionStore(ABC):
+    """token -> student_id mapping with expiry and eviction metrics.
+
+    Backends implement create, get and delete; a backend missing one
+    fails when it is instantiated.
+    """
+
+    def __init__(
+        self,
+        max_age: int = SESSION_MAX_AGE,
+        idle_timeout: int = SESSION_IDLE_TIMEOUT,
+        max_sessions: int = SESSION_MAX_COUNT,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_age = max_age
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self.evicted = {"expired": 0, "idle": 0, "cap": 0}
+        self.sweeps = 0
+        self.last_sweep_seconds = 0.0
+
+    @abstractmethod
+    def create(self, student_id: int, role: str = "student") -> str:
+        """Issue a new token for a student."""
+
+    @abstractmethod
+    def get(self, token: str) -> Optional[int]:
+        """Student id of a valid token, or None."""
+
+    @abstractmethod
+    def delete(self, token: str) -> bool:
+        """Remove a token. Returns True if it existed."""
+
+    def count(self) -> Optional[int]:
+        """Number of stored sessions, or None when the store keeps none."""
+        return None
+
+    def _sweep(self, batch_size: int) -> None:
+        """Remove expired sessions and enforce the cap, batch_size at a time."""
+
+    def sweep(self, batch_size: int = SWEEP_BATCH_SIZE) -> None:
+        start = time.perf_counter()
+        self._sweep(batch_size)
+        self.sweeps += 1
+        self.last_sweep_seconds = time.perf_counter() - start
+
+    def _expiry(self, created: float, last_seen: float, now: float) -> Optional[str]:
+        """Eviction reason for a session, or None while it is valid."""
+        if now - created >= self.max_age:
+            return "expired"
+        if now - last_seen >= self.idle_timeout:
+            return "idle"
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self).__name__,
+            "sessions": self.count(),
+            "max_sessions": self.max_sessions,
+            "max_age_seconds": self.max_age,
+            "idle_timeout_seconds": self.idle_timeout,
+            "evicted": dict(self.evicted),
+            "sweeps": self.sweeps,
+            "last_sweep_ms": round(self.last_sweep_seconds * 1000, 3),
+        }
+
+
+class MemorySessionStore(SessionStore):
+    """In-process sessions, kept in login order so the oldest evicts first."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # token -> [student_id, created, last_seen]
+        self._sessions: OrderedDict[str, list] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, student_id: int, role: str = "student") -> str:
+        token = secrets.token_urlsafe(32)
+        now = self.clock()
+        with self._lock:
+            self._sessions[token] = [student_id, now, now]
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted["cap"] += 1
+        return token
+
+    def get(self, token: str) -> Optional[int]:
+        now = self.clock()
+        with self._lock:
+            entry = self._sessions.get(token)
+            if entry is None:
+                return None
+            reason = self._expiry(entry[1], entry[2], now)
+            if reason:
+                del self._sessions[token]
+                self.evicted[reason] += 1
+                return None
+            entry[2] = now
+            return entry[0]
+
+    def delete(self, token: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(token, None) is not None
+
+    def count(self) -> int:
+        return len(self._sessions)
+
+    def _sweep(self, batch_size: int) -> None:
+        now = self.clock()
+        with self._lock:
+            tokens = list(self._sessions)
+        # Short lock holds so logins and lookups interleave with the sweep
+        for i in range(0, len(tokens), batch_size):
+            with self._lock:
+                for token in tokens[i:i + batch_size]:
+                    entry = self._sessions.get(token)
+                    if entry is None:
+                        continue
+                    reason = self._expiry(entry[1], entry[2], now)
+                    if reason:
+                        del self._sessions[token]
+                        self.evicted[reason] += 1
+
+
+class DatabaseSessionStore(SessionStore):
+    """Sessions in the auth_sessions table, using short-lived DB sessions."""
+
+    def create(self, student_id: int, role: str = "student") -> str:
+        token = secrets.token_urlsafe(32)
+        now = _utc(self.clock())
+        with SessionLocal() as db:
+            db.add(AuthSession(
+                token_hash=_token_key(token), student_id=student_id,
+                created_at=now, last_seen_at=now,
+            ))
+            db.commit()
+        return token
+
+    def get(self, token: str) -> Optional[int]:
+        now = self.clock()
+        with SessionLocal() as db:
+            row = db.query(AuthSession).filter(
+                AuthSession.token_hash == _token_key(token)
+            ).first()
+            if row is None:
+                return None
+            last_seen = (row.last_seen_at or row.created_at).replace(tzinfo=timezone.utc).timestamp()
+            reason = self._expiry(
+                row.created_at.replace(tzinfo=timezone.utc).timestamp(), last_seen, now,
+            )
+            if reason:
+                db.delete(row)
+                db.commit()
+                self.evicted[reason] += 1
+                return None
+            if now - last_seen >= TOUCH_INTERVAL:
+                row.last_seen_at = _utc(now)
+                db.commit()
+            return row.student_id
+
+    def delete(self, token: str) -> bool:
+        with SessionLocal() as db:
+            deleted = db.query(AuthSession).filter(
+                AuthSession.token_hash == _token_key(token)
+            ).delete(synchronize_session=False)
+            db.commit()
+            return deleted > 0
+
+    def count(self) -> int:
+        with SessionLocal() as db:
+            return db.query(func.count(AuthSession.token_hash)).scalar()
+
+    def _delete_batches(self, db, condition, batch_size: int, order_by=None, limit=None) -> int:
+        """Delete matching rows batch by batch, committing each batch."""
+        total = 0
+        while limit is None or total < limit:
+            size = batch_size if limit is None else min(batch_size, limit - total)
+            query = db.query(AuthSession.token_hash).filter(condition)
+            if order_by is not None:
+                query = query.order_by(order_by)
+            hashes = [h for (h,) in query.limit(size).all()]
+            if not hashes:
+                break
+            db.query(AuthSession).filter(
+                AuthSession.token_hash.in_(hashes)
+            ).delete(synchronize_session=False)
+            db.commit()
+            total += len(hashes)
+        return total
+
+    def _sweep(self, batch_size: int) -> None:
+        now = self.clock()
+        with SessionLocal() as db:
+            self.evicted["expired"] += self._delete_batches(
+                db, AuthSession.created_at < _utc(now - self.max_age), batch_size,
+            )
+            # Same fallback as get(): rows without last_seen_at use created_at
+            self.evicted["idle"] += self._delete_batches(
+                db, func.coalesce(AuthSession.last_seen_at, AuthSession.created_at)
+                < _utc(now - self.idle_timeout), batch_size,
+            )
+            excess = db.query(func.count(AuthSession.token_hash)).scalar() - self.max_sessions
+            if excess > 0:
+                self.evicted["cap"] += self._delete_batches(
+                    db, true(), batch_size, order_by=AuthSession.created_at, limit=excess,
+                )
+
+
+class KeyValueSessionStore(SessionStore):
+    """Sessions in a local SQLite file used as a key-value store.
+
+    WAL mode lets every worker process on the node read concurrently while
+    one writes.
+    """
+
+    def __init__(self, path: str = SESSION_KV_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "token_hash TEXT PRIMARY KEY, student_id INTEGER NOT NULL, "
+                "created_at REAL NOT NULL DEFAULT 0, last_seen REAL NOT NULL DEFAULT 0"
+                ") WITHOUT ROWID"
+            )
+            cols = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+            for col in ("created_at", "last_seen"):
+                if col not in cols:
+                    # Sessions from before expiry tracking count as expired
+                    self._conn.execute(f"ALTER TABLE sessions ADD COLUMN {col} REAL NOT NULL DEFAULT 0")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_created_at ON sessions (created_at)")
+
+    def create(self, student_id: int, role: str = "student") -> str:
+        token = secrets.token_urlsafe(32)
+        now = self.clock()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (token_hash, student_id, created_at, last_seen) "
+                "VALUES (?, ?, ?, ?)",
+                (_token_key(token), student_id, now, now),
+            )
+        return token
+
+    def get(self, token: str) -> Optional[int]:
+        now = self.clock()
+        key = _token_key(token)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT student_id, created_at, last_seen FROM sessions WHERE token_hash = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            student_id, created, last_seen = row
+            reason = self._expiry(created, last_seen, now)
+            if reason:
+                self._conn.execute("DELETE FROM sessions WHERE token_hash = ?", (key,))
+                self.evicted[reason] += 1
+                return None
+            if now - last_seen >= TOUCH_INTERVAL:
+                self._conn.execute(
+                    "UPDATE sessions SET last_seen = ? WHERE token_hash = ?", (now, key)
+                )
+        return student_id
+
+    def delete(self, token: str) -> bool:
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM sessions WHERE token_hash = ?", (_token_key(token),)
+            )
+        return cur.rowcount > 0
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def _delete_batches(self, where: str, params: tuple, batch_size: int, limit: Optional[int] = None) -> int:
+        total = 0
+        while limit is None or total < limit:
+            size = batch_size if limit is None else min(batch_size, limit - total)
+            with self._lock:
+                cur = self._conn.execute(
+                    "DELETE FROM sessions WHERE token_hash IN ("
+                    f"SELECT token_hash FROM sessions WHERE {where} ORDER BY created_at LIMIT ?)",
+                    (*params, size),
+                )
+            if cur.rowcount <= 0:
+                break
+            total += cur.rowcount
+        return total
+
+    def _sweep(self, batch_size: int) -> None:
+        now = self.clock()
+        self.evicted["expired"] += self._delete_batches(
+            "created_at < ?", (now - self.max_age,), batch_size,
+        )
+        self.evicted["idle"] += self._delete_batches(
+            "last_seen < ?", (now - self.idle_timeout,), batch_size,
+        )
+        excess = self.count() - self.max_sessions
+        if excess > 0:
+            self.evicted["cap"] += self._delete_batches("1", (), batch_size, limit=excess)
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class SignedSessionStore(SessionStore):
+    """Self-contained tokens: base64(payload).base64(HMAC-SHA256(payload)).
+
+    The payload holds the student id, role and expiry. The role is for
+    clients; authorization still reads it from the Student row. Logged-out
+    tokens are recorded in the revoked_tokens table of the app database,
+    shared by every worker and replica, until they would have expired
+    anyway. Verifying a token is therefore one primary-key read (skipped
+    for tokens this worker already saw revoked). There is no per-session
+    state, so idle timeout and the session cap do not apply.
+    """
+
+    def __init__(self, secret: str = SECRET_KEY, **kwargs):
+        super().__init__(**kwargs)
+        if not secret:
+            raise ValueError("SESSION_BACKEND=signed requires SECRET_KEY")
+        self._key = secret.encode()
+        # token hash -> exp of revocations seen by this worker
+        self._revoked: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _sign(self, body: bytes) -> bytes:
+        return hmac.new(self._key, body, hashlib.sha256).digest()
+
+    def create(self, student_id: int, role: str = "student") -> str:
+        payload = json.dumps(
+            {"sid": student_id, "role": role, "exp": int(self.clock()) + self.max_age,
+             "n": secrets.token_hex(4)},
+            separators=(",", ":"),
+        ).encode()
+        return f"{_b64encode(payload)}.{_b64encode(self._sign(payload))}"
+
+    def _verify(self, token: str) -> Optional[dict]:
+        """Payload of a well-formed, correctly signed, unexpired token."""
+        try:
+            body, sig = token.split(".")
+            payload, sig = _b64decode(body), _b64decode(sig)
+        except (ValueError, TypeError):
+            return None
+        if not hmac.compare_digest(sig, self._sign(payload)):
+            return None
+        payload = json.loads(payload)
+        if payload["exp"] <= self.clock():
+            return None
+        return payload
+
+    def _is_revoked(self, key: str, exp: int) -> bool:
+        if key in self._revoked:
+            return True
+        with SessionLocal() as db:
+            revoked = db.get(RevokedToken, key) is not None
+        if revoked:
+            with self._lock:
+                self._revoked[key] = exp
+        return revoked
+
+    def get(self, token: str) -> Optional[int]:
+        payload = self._verify(token)
+        if payload is None:
+            return None
+        if self._is_revoked(_token_key(token), payload["exp"]):
+            return None
+        return payload["sid"]
+
+    def delete(self, token: str) -> bool:
+        payload = self._verify(token)
+        if payload is None:
+            return False
+        key = _token_key(token)
+        with SessionLocal() as db:
+            stmt = dialect_insert(db, RevokedToken).values(
+                token_hash=key, expires_at=_utc(payload["exp"]),
+            ).on_conflict_do_nothing(index_elements=["token_hash"])
+            revoked = db.execute(stmt).rowcount > 0
+            db.commit()
+        with self._lock:
+            self._revoked[key] = payload["exp"]
+        return revoked
+
+    def _sweep(self, batch_size: int) -> None:
+        # Expiry-aligned cleanup: expired tokens fail verification anyway
+        now = self.clock()
+        with self._lock:
+            for key in [key for key, exp in self._revoked.items() if exp <= now]:
+                del self._revoked[key]
+        with SessionLocal() as db:
+            while True:
+                keys = [k for (k,) in db.query(RevokedToken.token_hash).filter(
+                    RevokedToken.expires_at <= _utc(now)
+                ).limit(batch_size).all()]
+                if not keys:
+                    break
+                db.query(RevokedToken).filter(
+                    RevokedToken.token_hash.in_(keys)
+                ).delete(synchronize_session=False)
+                db.commit()
+                self.evicted["expired"] += len(keys)
+
+    def stats(self) -> dict:
+        with SessionLocal() as db:
+            revoked = db.query(func.count(RevokedToken.token_hash)).scalar()
+        return {**super().stats(), "revoked": revoked}
+
+
+def build_session_store(backend: str = SESSION_BACKEND) -> SessionStore:
+    """Create the store for a SESSION_BACKEND value."""
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "database":
+        return DatabaseSessionStore()
+    if backend == "kv":
+        return KeyValueSessionStore()
+    if backend == "signed":
+        return SignedSessionStore()
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend!r} (expected memory, database, kv or signed)")
@@ -1,24 +1,279 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from collections import deque
+import logging
 import os
+import shlex
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./school.db")
 
 # Railway uses postgres:// but SQLAlchemy requires postgresql://
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
+# Pool sizing, per engine and per worker process: size the pool to the
+# requests one worker serves at once, and keep workers * (size + overflow)
+# below the database's connection limit.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Replace connections older than this many seconds (-1 = never), to stay
+# under server or proxy idle timeouts without a ping on every checkout
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+# Test connections with a round-trip on checkout (handles stale connections)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+
+class PoolMetrics:
+    """Checkout counters and wait times of one engine's pool."""
+
+    def __init__(self, recent: int = 1000):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=recent)
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self._waits.append(seconds)
+            self.waits += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def listen(self, engine) -> None:
+        """Count connects, checkouts and checkins through pool events."""
+        @event.listens_for(engine, "connect")
+        def _connect(dbapi_connection, connection_record):
+            with self._lock:
+                self.connects += 1
+
+        @event.listens_for(engine, "checkout")
+        def _checkout(dbapi_connection, connection_record, connection_proxy):
+            with self._lock:
+                self.checkouts += 1
+                self.in_use += 1
+                self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+        @event.listens_for(engine, "checkin")
+        def _checkin(dbapi_connection, connection_record):
+            with self._lock:
+                self.in_use -= 1
+
+        @event.listens_for(engine, "invalidate")
+        def _invalidate(dbapi_connection, connection_record, exception):
+            with self._lock:
+                self.invalidations += 1
+
+    def stats(self, pool) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            p95 = waits[int(len(waits) * 0.95)] if waits else 0.0
+            return {
+                "pool_size": pool.size(),
+                "max_overflow": DB_MAX_OVERFLOW,
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+                "idle": pool.checkedin(),
+                "peak_in_use": self.peak_in_use,
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": self.total_wait / self.waits * 1000 if self.waits else 0.0,
+                "wait_ms_p95": p95 * 1000,
+                "wait_ms_max": self.max_wait * 1000,
+            }
+
+
+def _metered(pool_class, metrics: PoolMetrics):
+    """Pool class that times each checkout (waiting for a connection plus pre-ping).
+
+    The pool events fire only once a connection has been handed out, so the
+    wait is measured around Pool.connect. A subclass survives engine.dispose(),
+    which recreates the pool from its class.
+    """
+    class MeteredPool(pool_class):
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                return super().connect()
+            except exc.TimeoutError:
+                metrics.record_timeout()
+                raise
+            finally:
+                metrics.record_wait(time.perf_counter() - start)
+
+    MeteredPool.__name__ = f"Metered{pool_class.__name__}"
+    return MeteredPool
+
+
+def _pool_options(pool_class, metrics: PoolMetrics) -> dict:
+    return {
+        "poolclass": _metered(pool_class, metrics),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+# SQLite profile applied to every new connection. WAL lets readers run
+# while one connection writes; busy_timeout makes a second writer wait for
+# the lock instead of failing with "database is locked". synchronous=NORMAL
+# is durable in WAL mode except for the last commits on power loss.
+SQLITE_TUNED = os.getenv("SQLITE_TUNED", "true").lower() == "true"
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_KB", "65536")),  # negative = KiB
+    "temp_store": "MEMORY",
+}
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None) -> None:
+    """Connect event handler setting SQLITE_PRAGMAS (sqlite3 or aiosqlite)."""
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+pool_metrics = PoolMetrics()
+
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
-    pool_pre_ping=True,  # Handle stale connections in production
+    **_pool_options(QueuePool, pool_metrics),
 )
+pool_metrics.listen(engine)
+if SQLITE_TUNED and engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", apply_sqlite_pragmas)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+# libpq sslmode values; asyncpg takes the same names as ssl=...
+SSL_MODES = {"disable", "allow", "prefer", "require", "verify-ca", "verify-full"}
+
+
+def _asyncpg_connect_args(query) -> dict:
+    """asyncpg connect() arguments for the libpq query parameters of a
+    postgresql:// URL. asyncpg rejects libpq names it does not know, so
+    each one is translated, and anything else is dropped with a warning."""
+    args, server_settings = {}, {}
+    for name, value in query.items():
+        if isinstance(value, tuple):
+            value = value[-1]
+        if name == "sslmode":
+            if value not in SSL_MODES:
+                raise ValueError(f"DATABASE_URL: unknown sslmode {value!r}")
+            args["ssl"] = value
+        elif name == "connect_timeout":
+            args["timeout"] = float(value)
+        elif name == "target_session_attrs":
+            args["target_session_attrs"] = value
+        elif name == "application_name":
+            server_settings["application_name"] = value
+        elif name == "options":
+            # "-c name=value" / "--name=value" pairs are server settings
+            tokens = shlex.split(value)
+            while tokens:
+                token = tokens.pop(0)
+                if token == "-c" and tokens:
+                    token = tokens.pop(0)
+                elif token.startswith("-c"):
+                    token = token[2:]
+                elif token.startswith("--"):
+                    token = token[2:]
+                else:
+                    logger.warning("DATABASE_URL: ignoring options entry %r for asyncpg", token)
+                    continue
+                key, sep, setting = token.partition("=")
+                if sep:
+                    server_settings[key.replace("-", "_")] = setting
+                else:
+                    logger.warning("DATABASE_URL: ignoring options entry %r for asyncpg", token)
+        else:
+            logger.warning("DATABASE_URL: ignoring %r, which asyncpg does not support", name)
+    if server_settings:
+        args["server_settings"] = server_settings
+    return args
+
+
+def _async_url(url: str) -> tuple[URL, dict]:
+    """Same database through an asyncio driver (aiosqlite / asyncpg), with
+    the connect_args that carry the URL's query parameters."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite"), {}
+    if parsed.get_backend_name() == "postgresql":
+        return (
+            parsed.set(drivername="postgresql+asyncpg", query={}),
+            _asyncpg_connect_args(parsed.query),
+        )
+    return parsed, {}
+
+
+# Async engine for handlers that await their queries instead of blocking
+# the event loop. Sync code (grading services) runs on it via run_sync().
+# Created on first use, so migrations and scripts on the sync engine do not
+# need the asyncio driver installed.
+async_pool_metrics = PoolMetrics()
+_async_engine = None
+_async_engine_lock = threading.Lock()
+
+
+def get_async_engine():
+    """The async engine; raises RuntimeError if its driver is not installed."""
+    global _async_engine
+    with _async_engine_lock:
+        if _async_engine is None:
+            url, connect_args = _async_url(DATABASE_URL)
+            try:
+                async_engine = create_async_engine(
+                    url, connect_args=connect_args,
+                    **_pool_options(AsyncAdaptedQueuePool, async_pool_metrics),
+                )
+            except ImportError as e:
+                raise RuntimeError(
+                    f"The async database path needs the {url.get_driver_name()} driver "
+                    f"for {url.get_backend_name()} (pip install -r requirements.txt): {e}"
+                ) from e
+            async_pool_metrics.listen(async_engine.sync_engine)
+            if SQLITE_TUNED and async_engine.dialect.name == "sqlite":
+                event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+            _async_engine = async_engine
+        return _async_engine
+
+
+# Objects stay usable after commit: lazy refreshes cannot run outside await
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -29,3 +284,25 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency for getting async database sessions."""
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        yield db
+
+
+def dialect_insert(db, model):
+    """INSERT for the session's database, with on_conflict_do_update()
+    (INSERT ... ON CONFLICT on both SQLite and PostgreSQL)."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+def get_pool_stats() -> dict:
+    """Live pool usage and checkout wait times of both engines."""
+    return {
+        "sync": pool_metrics.stats(engine.pool),
+        "async": async_pool_metrics.stats(get_async_engine().sync_engine.pool),
+    }
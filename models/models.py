@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Date, UniqueConstraint, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Date, UniqueConstraint, Boolean, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
 import random
@@ -24,6 +24,8 @@ class Student(Base):
     enrollments = relationship("StudentClass", back_populates="student", cascade="all, delete-orphan")
     special_points = relationship("SpecialPoints", back_populates="student", cascade="all, delete-orphan")
     submissions = relationship("Submission", back_populates="student", cascade="all, delete-orphan", foreign_keys="[Submission.student_id]")
+    grade_summaries = relationship("StudentGradeSummary", back_populates="student", cascade="all, delete-orphan")
+    auth_sessions = relationship("AuthSession", back_populates="student", cascade="all, delete-orphan")
 
 
 class Attendance(Base):
@@ -40,6 +42,13 @@ class Attendance(Base):
     student = relationship("Student", back_populates="attendances")
     class_ = relationship("Class", back_populates="attendances")
 
+    # class_id first: serves class-wide scans and (student_id, class_id) lookups.
+    # One row per student, class and day: the roll call upserts on it.
+    __table_args__ = (
+        Index('ix_attendances_class_student', 'class_id', 'student_id'),
+        UniqueConstraint('student_id', 'class_id', 'date', name='unique_student_class_date'),
+    )
+
 
 class Participation(Base):
     __tablename__ = "participations"
@@ -56,6 +65,11 @@ class Participation(Base):
     student = relationship("Student", back_populates="participations")
     class_ = relationship("Class", back_populates="participations")
 
+    __table_args__ = (
+        Index('ix_participations_class_student', 'class_id', 'student_id'),
+        Index('ix_participations_class_approved', 'class_id', 'approved'),
+    )
+
 
 class Grade(Base):
     __tablename__ = "grades"
@@ -69,12 +83,37 @@ class Grade(Base):
     score = Column(Float, nullable=False)
     max_score = Column(Float, nullable=False)
     date = Column(Date, nullable=False, default=date.today)
+    # Set for grades of assignment submissions; grading upserts on it
+    submission_id = Column(Integer, ForeignKey("submissions.id", ondelete="SET NULL"), nullable=True)
 
     # Relationships
     student = relationship("Student", back_populates="grades")
     class_ = relationship("Class", back_populates="grades")
     grade_category = relationship("GradeCategory")
 
+    __table_args__ = (
+        Index('ix_grades_class_student', 'class_id', 'student_id'),
+        UniqueConstraint('submission_id', name='unique_grade_submission'),
+    )
+
+
+# Links existing assignment grades, matched by title as grading used to do, to
+# their submission. Only the oldest grade of each (student, class, name) is
+# linked, so the link stays unique. Run when grades.submission_id is added, by
+# the app at startup and by its Alembic revision.
+GRADE_SUBMISSION_BACKFILL = """
+UPDATE grades SET submission_id = (
+    SELECT MIN(submissions.id) FROM submissions
+    JOIN assignments ON assignments.id = submissions.assignment_id
+    WHERE submissions.student_id = grades.student_id
+      AND assignments.class_id = grades.class_id
+      AND assignments.title = grades.name
+)
+WHERE submission_id IS NULL AND id IN (
+    SELECT MIN(id) FROM grades WHERE name IS NOT NULL GROUP BY student_id, class_id, name
+)
+"""
+
 
 class Class(Base):
     __tablename__ = "classes"
@@ -84,6 +123,7 @@ class Class(Base):
     code = Column(String(20), unique=True, nullable=False, index=True)
     teacher_id = Column(Integer, ForeignKey("students.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")  # bumped on every write
 
     # Relationships
     teacher = relationship("Student", back_populates="taught_classes")
@@ -94,6 +134,7 @@ class Class(Base):
     grade_categories = relationship("GradeCategory", back_populates="class_", cascade="all, delete-orphan")
     special_points = relationship("SpecialPoints", back_populates="class_", cascade="all, delete-orphan")
     assignments = relationship("Assignment", back_populates="class_", cascade="all, delete-orphan")
+    grade_summaries = relationship("StudentGradeSummary", back_populates="class_", cascade="all, delete-orphan")
 
     @staticmethod
     def generate_code(prefix: str = "") -> str:
@@ -171,6 +212,8 @@ class Assignment(Base):
     grade_category = relationship("GradeCategory")
     submissions = relationship("Submission", back_populates="assignment", cascade="all, delete-orphan")
 
+    __table_args__ = (Index('ix_assignments_class_published_due', 'class_id', 'published', 'due_date'),)
+
 
 class Submission(Base):
     __tablename__ = "submissions"
@@ -192,4 +235,56 @@ class Submission(Base):
     assignment = relationship("Assignment", back_populates="submissions")
     student = relationship("Student", back_populates="submissions", foreign_keys=[student_id])
 
-    __table_args__ = (UniqueConstraint('assignment_id', 'student_id', name='unique_assignment_student'),)
+    __table_args__ = (
+        UniqueConstraint('assignment_id', 'student_id', name='unique_assignment_student'),
+        Index('ix_submissions_assignment_grade', 'assignment_id', 'grade'),
+    )
+
+
+class StudentGradeSummary(Base):
+    """Materialized grade totals per (student, class), kept current on writes."""
+    __tablename__ = "student_grade_summary"
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
+    class_id = Column(Integer, ForeignKey("classes.id"), nullable=False, index=True)
+    category_averages = Column(JSON, nullable=False, default=dict)  # {category_id: average}
+    average_grade = Column(Float, nullable=False, default=0.0)
+    participation_points = Column(Integer, nullable=False, default=0)
+    participation_pending = Column(Integer, nullable=False, default=0, server_default="0")
+    special_points_total = Column(Float, nullable=False, default=0.0)
+    final_grade = Column(Float, nullable=False, default=0.0)
+    attendance_present = Column(Integer, nullable=False, default=0, server_default="0")
+    attendance_total = Column(Integer, nullable=False, default=0, server_default="0")
+    attendance_rate = Column(Float, nullable=False, default=0.0, server_default="0")
+    status = Column(String(20), nullable=False, default="at_risk", server_default="at_risk")  # good, warning, at_risk
+    last_activity = Column(Date, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    student = relationship("Student", back_populates="grade_summaries")
+    class_ = relationship("Class", back_populates="grade_summaries")
+
+    __table_args__ = (UniqueConstraint('student_id', 'class_id', name='unique_student_class_summary'),)
+
+
+class AuthSession(Base):
+    """Login session for the database session backend (see app.session_store)."""
+    __tablename__ = "auth_sessions"
+
+    token_hash = Column(String(64), primary_key=True)  # SHA-256 hex of the bearer token
+    student_id = Column(Integer, ForeignKey("students.id"), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_seen_at = Column(DateTime, default=datetime.utcnow, nullable=True, index=True)
+
+    # Relationships
+    student = relationship("Student", back_populates="auth_sessions")
+
+
+class RevokedToken(Base):
+    """Logged-out signed session token, kept until it would have expired
+    (see SignedSessionStore in app.session_store)."""
+    __tablename__ = "revoked_tokens"
+
+    token_hash = Column(String(64), primary_key=True)  # SHA-256 hex of the bearer token
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import datetime, date as date_type
-from typing import Optional, List, Union
+from typing import Optional, List, Union, Dict
 
 
 # Student schemas
@@ -275,6 +275,54 @@ class ClassDashboardResponse(BaseModel):
     recent_activity: List[dict]  # Recent attendance, grades, participation
 
 
+class ClassOverviewEntry(BaseModel):
+    class_id: int
+    class_name: str
+    class_code: str
+    student_count: int
+    pending_participation: int
+    average_grade: float
+
+
+class TeacherOverviewResponse(BaseModel):
+    total_classes: int
+    total_students: int
+    pending_participation: int
+    classes: List[ClassOverviewEntry]
+
+
+# Grade simulation schemas
+class SimulatedGradeItem(BaseModel):
+    category_id: Optional[int] = None
+    score: float
+    max_score: float
+    student_ids: Optional[List[int]] = None  # None = every student in the class
+
+
+class GradeSimulationRequest(BaseModel):
+    category_weights: Dict[int, float] = {}  # category_id -> hypothetical weight
+    extra_items: List[SimulatedGradeItem] = []
+    participation_factor: Optional[float] = None  # replaces 0.1 per approved point
+
+
+class SimulatedStudentGrade(BaseModel):
+    student_id: int
+    student_name: str
+    current_grade: float
+    projected_grade: float
+    delta: float
+    current_status: str
+    projected_status: str
+
+
+class GradeSimulationResponse(BaseModel):
+    class_id: int
+    current_average: float
+    projected_average: float
+    status_changes: int
+    students: List[SimulatedStudentGrade]
+
+
 # Assignment schemas
 class AssignmentCreate(BaseModel):
     class_id: int
@@ -4,16 +4,17 @@ Admin routes for teacher functionality.
 import logging
 from datetime import date, datetime as dt
 from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import case, func, or_, select, update
 
 logger = logging.getLogger(__name__)
 
-from models.database import get_db
+from models.database import dialect_insert, get_db, get_async_db
 from models.models import (
     Student, Attendance, Participation, Grade, Class, StudentClass,
-    GradeCategory, SpecialPoints, Assignment, Submission
+    GradeCategory, SpecialPoints, Assignment, Submission, StudentGradeSummary,
 )
 from models.schemas import (
     StudentResponse,
@@ -30,7 +31,6 @@ from models.schemas import (
     SpecialPointsCreate,
     SpecialPointsResponse,
     SpecialPointsUpdate,
-    CategoryGradeBreakdown,
     StudentRosterEntry,
     AssignmentCreate,
     AssignmentResponse,
@@ -39,8 +39,20 @@ from models.schemas import (
     SubmissionGradeRequest,
     AssignmentSubmissionsResponse,
     AutoGradeResult,
+    ClassOverviewEntry,
+    TeacherOverviewResponse,
+    GradeSimulationRequest,
+    GradeSimulationResponse,
+    SimulatedStudentGrade,
 )
 from app.auth import get_current_teacher
+from app.ownership import get_owned_assignment, get_owned_class, get_owned_submission, owns_class
+from app.grading import (
+    get_grade_calculations, calc_activity_stats, ensure_grade_summaries, refresh_grade_summaries,
+    student_status, EMPTY_ACTIVITY,
+)
+from app.gradebook import Gradebook
+from app.cache import bump_class_version, class_version, dashboard_cache, simulation_cache
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -54,11 +66,7 @@ async def list_students(
     """List students. If class_id provided, list only enrolled students."""
     if class_id:
         # Verify teacher owns this class
-        class_ = db.query(Class).filter(
-            Class.id == class_id,
-            Class.teacher_id == teacher.id,
-        ).first()
-        if not class_:
+        if not owns_class(teacher.id, class_id, db):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Clase no encontrada",
@@ -83,11 +91,7 @@ async def record_attendance(
     logger.info(f"Recording attendance: class_id={data.class_id}, date={data.date}, records={len(data.records)}")
 
     # Verify teacher owns this class
-    class_ = db.query(Class).filter(
-        Class.id == data.class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
+    if not owns_class(teacher.id, data.class_id, db, for_write=True):
         logger.error(f"Class not found or not owned by teacher: class_id={data.class_id}, teacher_id={teacher.id}")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -95,48 +99,48 @@ async def record_attendance(
         )
 
     attendance_date = data.date or date.today()
-    results = []
+    # One row per student and day: if a student is sent twice, the last record wins
+    records = {record.student_id: record for record in data.records}
 
     try:
-        for record in data.records:
-            # Verify student is enrolled in this class
-            enrollment = db.query(StudentClass).filter(
-                StudentClass.student_id == record.student_id,
+        enrolled = {
+            sid for (sid,) in db.query(StudentClass.student_id).filter(
                 StudentClass.class_id == data.class_id,
-            ).first()
-            if not enrollment:
-                logger.warning(f"Student {record.student_id} not enrolled in class {data.class_id}")
+                StudentClass.student_id.in_(records),
+            )
+        }
+        rows = []
+        for student_id, record in records.items():
+            if student_id not in enrolled:
                 # Skip this student but continue with others
+                logger.warning(f"Student {student_id} not enrolled in class {data.class_id}")
                 continue
+            rows.append({
+                "student_id": student_id,
+                "class_id": data.class_id,
+                "date": attendance_date,
+                "status": record.status,
+                "notes": record.notes,
+            })
 
-            # Check if attendance already exists for this student, date, and class
-            existing = db.query(Attendance).filter(
-                Attendance.student_id == record.student_id,
-                Attendance.class_id == data.class_id,
-                Attendance.date == attendance_date,
-            ).first()
-
-            if existing:
-                # Update existing record
-                existing.status = record.status
-                existing.notes = record.notes
-                results.append(existing)
-            else:
-                # Create new record
-                attendance = Attendance(
-                    student_id=record.student_id,
-                    class_id=data.class_id,
-                    date=attendance_date,
-                    status=record.status,
-                    notes=record.notes,
-                )
-                db.add(attendance)
-                results.append(attendance)
+        # Insert new rows and update the day's existing ones in one statement
+        results = []
+        if rows:
+            stmt = dialect_insert(db, Attendance).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["student_id", "class_id", "date"],
+                set_={"status": stmt.excluded.status, "notes": stmt.excluded.notes},
+            ).returning(
+                Attendance.id, Attendance.student_id, Attendance.date,
+                Attendance.status, Attendance.notes,
+            )
+            order = {row["student_id"]: i for i, row in enumerate(rows)}
+            results = sorted(db.execute(stmt).all(), key=lambda r: order[r.student_id])
 
         # Commit all changes at once
+        refresh_grade_summaries(data.class_id, db, [r.student_id for r in results])
+        bump_class_version(db, data.class_id)
         db.commit()
-        for r in results:
-            db.refresh(r)
 
         logger.info(f"Successfully saved {len(results)} attendance records")
         return results
@@ -159,11 +163,7 @@ async def get_attendance(
 ):
     """Get attendance records for a specific class and optionally a date."""
     # Verify teacher owns this class
-    class_ = db.query(Class).filter(
-        Class.id == class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
+    if not owns_class(teacher.id, class_id, db):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Clase no encontrada",
@@ -192,11 +192,7 @@ async def add_grade(
 ):
     """Add a grade for a student in a class."""
     # Verify teacher owns this class
-    class_ = db.query(Class).filter(
-        Class.id == data.class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
+    if not owns_class(teacher.id, data.class_id, db, for_write=True):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Clase no encontrada",
@@ -233,6 +229,8 @@ async def add_grade(
         date=data.date or date.today(),
     )
     db.add(grade)
+    refresh_grade_summaries(data.class_id, db, [data.student_id])
+    bump_class_version(db, data.class_id)
     db.commit()
     db.refresh(grade)
     return grade
@@ -247,11 +245,7 @@ async def get_participation(
 ):
     """Get participation submissions for a class with student info."""
     # Verify teacher owns this class
-    class_ = db.query(Class).filter(
-        Class.id == class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
+    if not owns_class(teacher.id, class_id, db):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Clase no encontrada",
@@ -291,11 +285,7 @@ async def bulk_approve_participation(
 ):
     """Approve multiple participation submissions at once."""
     # Verify teacher owns this class
-    class_ = db.query(Class).filter(
-        Class.id == data.class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
+    if not owns_class(teacher.id, data.class_id, db, for_write=True):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Clase no encontrada",
@@ -321,6 +311,8 @@ async def bulk_approve_participation(
         if points_map.get(p.id) is not None:
             p.points = points_map[p.id]
 
+    refresh_grade_summaries(data.class_id, db, [p.student_id for p in participations])
+    bump_class_version(db, data.class_id)
     db.commit()
 
     return {"approved_count": len(participations)}
@@ -348,6 +340,9 @@ async def update_participation(
     if data.points is not None:
         participation.points = data.points
 
+    if participation.class_id:
+        refresh_grade_summaries(participation.class_id, db, [participation.student_id])
+        bump_class_version(db, participation.class_id)
     db.commit()
     db.refresh(participation)
 
@@ -372,11 +367,7 @@ async def get_grade_categories(
     db: Session = Depends(get_db),
 ):
     """Get all grade categories for a class."""
-    class_ = db.query(Class).filter(
-        Class.id == class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
+    if not owns_class(teacher.id, class_id, db):
         raise HTTPException(status_code=404, detail="Clase no encontrada")
 
     return db.query(GradeCategory).filter(GradeCategory.class_id == class_id).all()
@@ -390,11 +381,7 @@ async def create_grade_category(
     db: Session = Depends(get_db),
 ):
     """Create a grade category for a class."""
-    class_ = db.query(Class).filter(
-        Class.id == class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
+    if not owns_class(teacher.id, class_id, db, for_write=True):
         raise HTTPException(status_code=404, detail="Clase no encontrada")
 
     # Check if category name already exists
@@ -411,6 +398,8 @@ async def create_grade_category(
         weight=data.weight,
     )
     db.add(category)
+    refresh_grade_summaries(class_id, db)
+    bump_class_version(db, class_id)
     db.commit()
     db.refresh(category)
     return category
@@ -426,11 +415,7 @@ async def update_grade_category(
 ):
     """Update a grade category."""
     # Verify teacher owns the class
-    class_ = db.query(Class).filter(
-        Class.id == class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
+    if not owns_class(teacher.id, class_id, db, for_write=True):
         raise HTTPException(status_code=403, detail="No tienes permiso para editar esta categoria")
 
     category = db.query(GradeCategory).filter(
@@ -445,6 +430,8 @@ async def update_grade_category(
     if data.weight is not None:
         category.weight = data.weight
 
+    refresh_grade_summaries(class_id, db)
+    bump_class_version(db, class_id)
     db.commit()
     db.refresh(category)
     return category
@@ -458,11 +445,7 @@ async def delete_grade_category(
     db: Session = Depends(get_db),
 ):
     """Delete a grade category."""
-    class_ = db.query(Class).filter(
-        Class.id == class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
+    if not owns_class(teacher.id, class_id, db, for_write=True):
         raise HTTPException(status_code=403, detail="No tienes permiso")
 
     category = db.query(GradeCategory).filter(
@@ -473,6 +456,8 @@ async def delete_grade_category(
         raise HTTPException(status_code=404, detail="Categoria no encontrada")
 
     db.delete(category)
+    refresh_grade_summaries(class_id, db)
+    bump_class_version(db, class_id)
     db.commit()
     return {"message": "Categoria eliminada"}
 
@@ -487,11 +472,7 @@ async def get_special_points(
     db: Session = Depends(get_db),
 ):
     """Get special points for a class, optionally filtered by student."""
-    class_ = db.query(Class).filter(
-        Class.id == class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
+    if not owns_class(teacher.id, class_id, db):
         raise HTTPException(status_code=404, detail="Clase no encontrada")
 
     query = db.query(SpecialPoints).filter(SpecialPoints.class_id == class_id)
@@ -514,11 +495,7 @@ async def create_special_points(
     db: Session = Depends(get_db),
 ):
     """Create special points entry for a student."""
-    class_ = db.query(Class).filter(
-        Class.id == data.class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
+    if not owns_class(teacher.id, data.class_id, db, for_write=True):
         raise HTTPException(status_code=404, detail="Clase no encontrada")
 
     # Verify student is enrolled
@@ -545,6 +522,8 @@ async def create_special_points(
         opted_in=data.opted_in,
     )
     db.add(special)
+    refresh_grade_summaries(data.class_id, db, [data.student_id])
+    bump_class_version(db, data.class_id)
     db.commit()
     db.refresh(special)
     return special
@@ -562,11 +541,7 @@ async def update_special_points(
     if not special:
         raise HTTPException(status_code=404, detail="Registro no encontrado")
 
-    class_ = db.query(Class).filter(
-        Class.id == special.class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
+    if not owns_class(teacher.id, special.class_id, db, for_write=True):
         raise HTTPException(status_code=403, detail="No tienes permiso")
 
     if data.opted_in is not None:
@@ -574,151 +549,26 @@ async def update_special_points(
     if data.awarded is not None:
         special.awarded = data.awarded
 
+    refresh_grade_summaries(special.class_id, db, [special.student_id])
+    bump_class_version(db, special.class_id)
     db.commit()
     db.refresh(special)
     return special
 
 
-# ==================== Grade Calculation ====================
-
-def _calc_grade(student_id: int, class_id: int, db: Session) -> dict:
-    """Calculate grade using category weights, participation, and special points.
-
-    Formula: Σ(category_avg × weight) + (participation × 0.1) + special_points
-    """
-    # Get categories for this class
-    categories = db.query(GradeCategory).filter(
-        GradeCategory.class_id == class_id
-    ).all()
-
-    # Get all grades for this student/class
-    all_grades = db.query(Grade).filter(
-        Grade.student_id == student_id,
-        Grade.class_id == class_id,
-    ).all()
-
-    category_breakdowns = []
-    weighted_sum = 0.0
-
-    for cat in categories:
-        cat_grades = [g for g in all_grades if g.category_id == cat.id]
-        valid = [g for g in cat_grades if g.max_score and g.max_score > 0]
-        avg = (sum((g.score / g.max_score) * 100 for g in valid) / len(valid)) if valid else 0.0
-        contribution = avg * cat.weight
-        weighted_sum += contribution
-
-        # Assignment counts for this category
-        cat_assignments = db.query(Assignment).filter(
-            Assignment.class_id == class_id,
-            Assignment.category_id == cat.id,
-            Assignment.published == True,
-        ).all()
-        total_assignments = len(cat_assignments)
-
-        graded_count = 0
-        pending_count = 0
-        for a in cat_assignments:
-            sub = db.query(Submission).filter(
-                Submission.assignment_id == a.id,
-                Submission.student_id == student_id,
-            ).first()
-            if sub and sub.grade is not None:
-                graded_count += 1
-            elif sub:
-                pending_count += 1
-
-        category_breakdowns.append(CategoryGradeBreakdown(
-            category_id=cat.id,
-            category_name=cat.name,
-            weight=cat.weight,
-            grades=[GradeResponse(
-                id=g.id, student_id=g.student_id, category_id=g.category_id,
-                category=g.category, name=g.name, score=g.score,
-                max_score=g.max_score, date=g.date,
-            ) for g in cat_grades],
-            average=avg,
-            weighted_contribution=contribution,
-            graded_count=graded_count,
-            pending_count=pending_count,
-            total_assignments=total_assignments,
-        ))
-
-    # Fallback: if no categories, use simple average
-    if not categories:
-        valid = [g for g in all_grades if g.max_score and g.max_score > 0]
-        weighted_sum = (sum((g.score / g.max_score) * 100 for g in valid) / len(valid)) if valid else 0.0
-
-    # Participation bonus (no cap)
-    part_pts = db.query(func.sum(Participation.points)).filter(
-        Participation.student_id == student_id,
-        Participation.class_id == class_id,
-        Participation.approved == "approved",
-    ).scalar() or 0
-
-    part_contribution = 0.1 * int(part_pts)
-
-    # Special points
-    sp_records = db.query(SpecialPoints).filter(
-        SpecialPoints.student_id == student_id,
-        SpecialPoints.class_id == class_id,
-    ).all()
-    sp_total = sum(sp.points_value for sp in sp_records if sp.opted_in and sp.awarded)
-
-    final = weighted_sum + part_contribution + sp_total
-
-    # Simple average for display (without weights)
-    valid_all = [g for g in all_grades if g.max_score and g.max_score > 0]
-    avg_grade = (sum((g.score / g.max_score) * 100 for g in valid_all) / len(valid_all)) if valid_all else 0.0
-
-    return {
-        "average_grade": avg_grade,
-        "participation_points": int(part_pts),
-        "participation_contribution": part_contribution,
-        "special_points": sp_records,
-        "special_points_total": sp_total,
-        "category_breakdowns": category_breakdowns,
-        "final_grade": final,
-    }
-
-
 # ==================== Student Roster ====================
 
-@router.get("/roster/{class_id}", response_model=List[StudentRosterEntry])
-async def get_student_roster(
-    class_id: int,
-    teacher: Student = Depends(get_current_teacher),
-    db: Session = Depends(get_db),
-):
-    """Get student roster with grades and attendance."""
-    class_ = db.query(Class).filter(
-        Class.id == class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
-        raise HTTPException(status_code=404, detail="Clase no encontrada")
-
-    enrollments = db.query(StudentClass).filter(StudentClass.class_id == class_id).all()
+def _roster_entries(class_: Class, students: list, db: Session) -> List[StudentRosterEntry]:
+    """Build roster entries for the given students with batched queries."""
+    class_id = class_.id
+    student_ids = [st.id for st in students]
+    grades = get_grade_calculations(class_id, db, student_ids, class_version(class_))
+    activity = calc_activity_stats(class_id, db, student_ids)
 
     roster = []
-    for enrollment in enrollments:
-        student = enrollment.student
-        if not student:
-            continue
-
-        att = db.query(Attendance).filter(
-            Attendance.student_id == student.id,
-            Attendance.class_id == class_id,
-        ).all()
-        present = sum(1 for a in att if a.status in ("present", "late"))
-        att_rate = (present / len(att) * 100) if att else 0.0
-
-        gd = _calc_grade(student.id, class_id, db)
-
-        sp_responses = [SpecialPointsResponse(
-            id=sp.id, student_id=sp.student_id, class_id=sp.class_id,
-            category=sp.category, opted_in=sp.opted_in, awarded=sp.awarded,
-            points_value=sp.points_value, created_at=sp.created_at,
-        ) for sp in gd["special_points"]]
+    for student in students:
+        att_rate = activity.get(student.id, EMPTY_ACTIVITY)["attendance_rate"]
+        gd = grades[student.id]
 
         roster.append(StudentRosterEntry(
             student=StudentResponse(
@@ -731,18 +581,224 @@ async def get_student_roster(
             attendance_rate=att_rate,
             participation_points=gd["participation_points"],
             grade_breakdown=gd["category_breakdowns"],
-            special_points=sp_responses,
+            special_points=gd["special_points"],
             final_grade=gd["final_grade"],
         ))
 
     return roster
 
 
+@router.get("/roster/{class_id}", response_model=List[StudentRosterEntry])
+async def get_student_roster(
+    class_id: int,
+    class_: Class = Depends(get_owned_class),
+    db: Session = Depends(get_db),
+):
+    """Get student roster with grades and attendance."""
+    students = db.query(Student).join(
+        StudentClass, StudentClass.student_id == Student.id
+    ).filter(
+        StudentClass.class_id == class_id
+    ).order_by(StudentClass.id).all()
+
+    return _roster_entries(class_, students, db)
+
+
+@router.get("/roster/{class_id}/students/{student_id}", response_model=StudentRosterEntry)
+async def get_student_roster_entry(
+    class_id: int,
+    student_id: int,
+    class_: Class = Depends(get_owned_class),
+    db: Session = Depends(get_db),
+):
+    """Get one student's roster entry (grades breakdown and attendance)."""
+    student = db.query(Student).join(
+        StudentClass, StudentClass.student_id == Student.id
+    ).filter(
+        StudentClass.class_id == class_id,
+        Student.id == student_id,
+    ).first()
+    if not student:
+        raise HTTPException(status_code=404, detail="Estudiante no encontrado en esta clase")
+
+    return _roster_entries(class_, [student], db)[0]
+
+
 # ==================== Class Dashboard ====================
 
 from models.schemas import ClassDashboardResponse, ClassDashboardStats, StudentDashboardEntry
 
 
+def _build_dashboard(class_: Class, db: Session) -> dict:
+    """Compute the class-wide part of the dashboard (stats, recent activity).
+
+    Student rows are paged, filtered and sorted in SQL per request, so they
+    are not part of the cached payload.
+    """
+    class_id = class_.id
+    class_name, class_code = class_.name, class_.code
+
+    # 3. Class-wide aggregates over the summaries
+    n, total_att, total_grade = db.query(
+        func.count(StudentGradeSummary.id),
+        func.sum(StudentGradeSummary.attendance_rate),
+        func.sum(StudentGradeSummary.final_grade),
+    ).join(
+        StudentClass,
+        (StudentClass.student_id == StudentGradeSummary.student_id)
+        & (StudentClass.class_id == StudentGradeSummary.class_id),
+    ).filter(StudentGradeSummary.class_id == class_id).one()
+    logger.info(f"Class {class_id}: {n} students")
+    overall_att = ((total_att or 0.0) / n) if n > 0 else 0.0
+    avg_grade = ((total_grade or 0.0) / n) if n > 0 else 0.0
+
+    # 4. Pending participation
+    pending_participation = db.query(func.count(Participation.id)).filter(
+        Participation.class_id == class_id,
+        Participation.approved == "pending",
+    ).scalar() or 0
+
+    # 5. Recent activity
+    recent = []
+
+    # Student names joined in, instead of one lookup per row
+    for a, student_name in db.query(Attendance, Student.name).outerjoin(
+        Student, Student.id == Attendance.student_id
+    ).filter(
+        Attendance.class_id == class_id
+    ).order_by(Attendance.date.desc()).limit(5).all():
+        recent.append({
+            "type": "attendance",
+            "date": str(a.date),
+            "student_name": student_name or "Desconocido",
+            "detail": f"Asistencia: {a.status}",
+        })
+
+    for p, student_name in db.query(Participation, Student.name).outerjoin(
+        Student, Student.id == Participation.student_id
+    ).filter(
+        Participation.class_id == class_id
+    ).order_by(Participation.date.desc()).limit(5).all():
+        desc = p.description or ""
+        recent.append({
+            "type": "participation",
+            "date": str(p.date),
+            "student_name": student_name or "Desconocido",
+            "detail": f"Participación: {desc[:50]}" if len(desc) > 50 else f"Participación: {desc}",
+            "status": p.approved,
+        })
+
+    recent.sort(key=lambda x: x["date"], reverse=True)
+    recent = recent[:10]
+
+    # 6. Load categories for this class
+    class_categories = db.query(GradeCategory).filter(
+        GradeCategory.class_id == class_id
+    ).all()
+
+    cat_responses = [GradeCategoryResponse(
+        id=c.id, class_id=c.class_id, name=c.name,
+        weight=c.weight, created_at=c.created_at,
+    ) for c in class_categories]
+
+    return {
+        "stats": {
+            "class_id": class_id,
+            "class_name": class_name,
+            "class_code": class_code,
+            "total_students": n,
+            "overall_attendance_rate": overall_att,
+            "average_grade": avg_grade,
+            "pending_participation": pending_participation,
+            "categories": cat_responses,
+        },
+        "recent_activity": recent,
+    }
+
+
+DASHBOARD_SORT_COLUMNS = {
+    "name": func.lower(Student.name),
+    "attendance": StudentGradeSummary.attendance_rate,
+    "grade": StudentGradeSummary.final_grade,
+    "participation": StudentGradeSummary.participation_points,
+    "status": StudentGradeSummary.status,
+}
+
+
+def _dashboard_queries(
+    class_id: int,
+    sort_by: str,
+    sort_order: str,
+    search: Optional[str],
+    status_filter: Optional[str],
+    limit: Optional[int],
+    offset: int,
+) -> tuple:
+    """Statements for the dashboard's filtered stats and its page of rows."""
+    # Filter
+    conditions = [StudentClass.class_id == class_id]
+    if search:
+        sl = search.lower()
+        conditions.append(or_(
+            func.lower(Student.name).contains(sl, autoescape=True),
+            func.lower(Student.email).contains(sl, autoescape=True),
+        ))
+
+    if status_filter and status_filter != "all":
+        conditions.append(StudentGradeSummary.status == status_filter)
+
+    def roster(stmt):
+        return stmt.select_from(Student).join(
+            StudentClass, StudentClass.student_id == Student.id,
+        ).join(
+            StudentGradeSummary,
+            (StudentGradeSummary.student_id == StudentClass.student_id)
+            & (StudentGradeSummary.class_id == StudentClass.class_id),
+        ).where(*conditions)
+
+    # Filtered stats
+    stats_query = roster(select(
+        func.count(Student.id),
+        func.sum(case((StudentGradeSummary.status == "at_risk", 1), else_=0)),
+        func.sum(case((StudentGradeSummary.final_grade >= 90, 1), else_=0)),
+    ))
+
+    # Sort (enrollment order breaks ties) and page
+    sort_col = DASHBOARD_SORT_COLUMNS.get(sort_by, DASHBOARD_SORT_COLUMNS["name"])
+    rows_query = roster(select(Student, StudentGradeSummary)).order_by(
+        sort_col.desc() if sort_order == "desc" else sort_col.asc(),
+        StudentClass.id.asc(),
+    ).offset(offset)
+    if limit is not None:
+        rows_query = rows_query.limit(limit)
+    return stats_query, rows_query
+
+
+def _dashboard_rows(rows) -> list[dict]:
+    """Dashboard student entries from (Student, StudentGradeSummary) rows."""
+    students_data = []
+    for student, summary in rows:
+        last_activity = (
+            dt.combine(summary.last_activity, dt.min.time())
+            if summary.last_activity else None
+        )
+        students_data.append({
+            "id": student.id,
+            "name": student.name,
+            "email": student.email,
+            "attendance_rate": summary.attendance_rate,
+            "attendance_present": summary.attendance_present,
+            "attendance_total": summary.attendance_total,
+            "participation_points": summary.participation_points,
+            "participation_pending": summary.participation_pending,
+            "average_grade": summary.average_grade,
+            "final_grade": summary.final_grade,
+            "last_activity": last_activity.isoformat() if last_activity else None,
+            "status": summary.status,
+        })
+    return students_data
+
+
 @router.get("/classes/{class_id}/dashboard")
 async def get_class_dashboard(
     class_id: int,
@@ -750,195 +806,64 @@ async def get_class_dashboard(
     sort_order: str = "asc",
     search: Optional[str] = None,
     status_filter: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    offset: int = Query(0, ge=0),
     teacher: Student = Depends(get_current_teacher),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Class dashboard using only core tables. No grade_categories/special_points."""
+    """Class dashboard.
+
+    Class-wide stats are cached per class version. Student rows come from
+    the materialized summaries with search, status filter, sort and
+    limit/offset applied in SQL.
+    """
     logger.info(f"Dashboard requested for class_id={class_id}")
 
     # 1. Class info
-    class_ = db.query(Class).filter(
-        Class.id == class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
+    class_ = (await db.execute(
+        select(Class).where(
+            Class.id == class_id,
+            Class.teacher_id == teacher.id,
+        )
+    )).scalars().first()
     if not class_:
         raise HTTPException(status_code=404, detail="Clase no encontrada")
 
     try:
-        # 2. Enrolled students
-        enrollments = db.query(StudentClass).filter(
-            StudentClass.class_id == class_id
-        ).all()
-        logger.info(f"Class {class_id}: {len(enrollments)} students")
-
-        # 3. Pending participation
-        pending_participation = db.query(func.count(Participation.id)).filter(
-            Participation.class_id == class_id,
-            Participation.approved == "pending",
-        ).scalar() or 0
-
-        # 4. Build student rows — one at a time, simple queries
-        students_data = []
-        total_att = 0.0
-        total_grade = 0.0
-
-        for enrollment in enrollments:
-            student = enrollment.student
-            if not student:
-                continue
-
-            # Attendance
-            att_records = db.query(Attendance).filter(
-                Attendance.student_id == student.id,
-                Attendance.class_id == class_id,
-            ).all()
-            att_total = len(att_records)
-            att_present = sum(1 for a in att_records if a.status in ("present", "late"))
-            att_rate = (att_present / att_total * 100) if att_total > 0 else 0.0
-
-            # Participation
-            part_approved = db.query(func.sum(Participation.points)).filter(
-                Participation.student_id == student.id,
-                Participation.class_id == class_id,
-                Participation.approved == "approved",
-            ).scalar() or 0
-
-            part_pending = db.query(func.count(Participation.id)).filter(
-                Participation.student_id == student.id,
-                Participation.class_id == class_id,
-                Participation.approved == "pending",
-            ).scalar() or 0
-
-            # Grades
-            gd = _calc_grade(student.id, class_id, db)
-
-            # Last activity date
-            last_att = db.query(func.max(Attendance.date)).filter(
-                Attendance.student_id == student.id,
-                Attendance.class_id == class_id,
-            ).scalar()
-            last_part = db.query(func.max(Participation.date)).filter(
-                Participation.student_id == student.id,
-                Participation.class_id == class_id,
-            ).scalar()
-            last_grd = db.query(func.max(Grade.date)).filter(
-                Grade.student_id == student.id,
-                Grade.class_id == class_id,
-            ).scalar()
-
-            dates = [d for d in [last_att, last_part, last_grd] if d is not None]
-            last_activity = dt.combine(max(dates), dt.min.time()) if dates else None
-
-            # Status
-            final = gd["final_grade"]
-            if att_rate < 60 or final < 60:
-                sstatus = "at_risk"
-            elif att_rate < 80 or final < 70:
-                sstatus = "warning"
-            else:
-                sstatus = "good"
-
-            students_data.append({
-                "id": student.id,
-                "name": student.name,
-                "email": student.email,
-                "attendance_rate": att_rate,
-                "attendance_present": att_present,
-                "attendance_total": att_total,
-                "participation_points": int(part_approved),
-                "participation_pending": int(part_pending),
-                "average_grade": gd["average_grade"],
-                "final_grade": final,
-                "last_activity": last_activity.isoformat() if last_activity else None,
-                "status": sstatus,
-            })
-
-            total_att += att_rate
-            total_grade += final
-
-        # 5. Filter
-        if search:
-            sl = search.lower()
-            students_data = [s for s in students_data if sl in s["name"].lower() or sl in s["email"].lower()]
-
-        if status_filter and status_filter != "all":
-            students_data = [s for s in students_data if s["status"] == status_filter]
-
-        # 6. Sort
-        reverse = sort_order == "desc"
-        sort_keys = {
-            "name": lambda s: s["name"].lower(),
-            "attendance": lambda s: s["attendance_rate"],
-            "grade": lambda s: s["final_grade"],
-            "participation": lambda s: s["participation_points"],
-        }
-        students_data.sort(key=sort_keys.get(sort_by, sort_keys["name"]), reverse=reverse)
-
-        # 7. Stats
-        n = len(enrollments)
-        overall_att = (total_att / n) if n > 0 else 0.0
-        avg_grade = (total_grade / n) if n > 0 else 0.0
-        at_risk = sum(1 for s in students_data if s["status"] == "at_risk")
-        top = sum(1 for s in students_data if s["final_grade"] >= 90)
-
-        # 8. Recent activity
-        recent = []
-
-        for a in db.query(Attendance).filter(
-            Attendance.class_id == class_id
-        ).order_by(Attendance.date.desc()).limit(5).all():
-            st = db.query(Student).filter(Student.id == a.student_id).first()
-            recent.append({
-                "type": "attendance",
-                "date": str(a.date),
-                "student_name": st.name if st else "Desconocido",
-                "detail": f"Asistencia: {a.status}",
-            })
-
-        for p in db.query(Participation).filter(
-            Participation.class_id == class_id
-        ).order_by(Participation.date.desc()).limit(5).all():
-            st = db.query(Student).filter(Student.id == p.student_id).first()
-            desc = p.description or ""
-            recent.append({
-                "type": "participation",
-                "date": str(p.date),
-                "student_name": st.name if st else "Desconocido",
-                "detail": f"Participación: {desc[:50]}" if len(desc) > 50 else f"Participación: {desc}",
-                "status": p.approved,
-            })
-
-        recent.sort(key=lambda x: x["date"], reverse=True)
-        recent = recent[:10]
-
-        # 9. Load categories for this class
-        class_categories = db.query(GradeCategory).filter(
-            GradeCategory.class_id == class_id
-        ).all()
+        # 2. Make sure every enrolled student has a materialized summary: one
+        # query, plus a short commit the first time a student is missing.
+        created = await db.run_sync(lambda sync_db: ensure_grade_summaries(class_id, sync_db))
+        if created:
+            logger.info(f"Class {class_id}: created {created} grade summaries")
+
+        version = class_version(class_)
+        payload = dashboard_cache.get(class_id, version)
+        if payload is None:
+            payload = await db.run_sync(lambda sync_db: _build_dashboard(class_, sync_db))
+            dashboard_cache.set(class_id, version, payload)
+        else:
+            logger.info(f"Dashboard cache hit: class {class_id}, version {version[0]}")
 
-        cat_responses = [GradeCategoryResponse(
-            id=c.id, class_id=c.class_id, name=c.name,
-            weight=c.weight, created_at=c.created_at,
-        ) for c in class_categories]
+        stats_query, rows_query = _dashboard_queries(
+            class_id, sort_by, sort_order, search, status_filter, limit, offset,
+        )
+        filtered_count, at_risk, top = (await db.execute(stats_query)).one()
+        students_data = _dashboard_rows((await db.execute(rows_query)).all())
 
-        # 10. Return
-        logger.info(f"Dashboard OK: class {class_id}, {len(students_data)} students")
+        logger.info(f"Dashboard OK: class {class_id}, {len(students_data)} of {filtered_count} students")
 
         return {
             "stats": {
-                "class_id": class_id,
-                "class_name": class_.name,
-                "class_code": class_.code,
-                "total_students": n,
-                "overall_attendance_rate": overall_att,
-                "average_grade": avg_grade,
-                "pending_participation": pending_participation,
-                "students_at_risk": at_risk,
-                "top_performers": top,
-                "categories": cat_responses,
+                **payload["stats"],
+                "students_at_risk": int(at_risk or 0),
+                "top_performers": int(top or 0),
             },
             "students": students_data,
-            "recent_activity": recent,
+            "total_count": payload["stats"]["total_students"],
+            "filtered_count": filtered_count,
+            "limit": limit,
+            "offset": offset,
+            "recent_activity": payload["recent_activity"],
         }
 
     except HTTPException:
@@ -951,6 +876,154 @@ async def get_class_dashboard(
         )
 
 
+@router.get("/overview", response_model=TeacherOverviewResponse)
+async def get_teacher_overview(
+    teacher: Student = Depends(get_current_teacher),
+    db: Session = Depends(get_db),
+):
+    """Per-class pending participation and average grade for all of the
+    teacher's classes, from grouped queries instead of one dashboard each."""
+    classes = db.query(Class).filter(
+        Class.teacher_id == teacher.id
+    ).order_by(Class.id).all()
+    class_ids = [c.id for c in classes]
+
+    student_counts = dict(
+        db.query(StudentClass.class_id, func.count(StudentClass.id)).filter(
+            StudentClass.class_id.in_(class_ids)
+        ).group_by(StudentClass.class_id).all()
+    )
+
+    pending = dict(
+        db.query(Participation.class_id, func.count(Participation.id)).filter(
+            Participation.class_id.in_(class_ids),
+            Participation.approved == "pending",
+        ).group_by(Participation.class_id).all()
+    )
+
+    def summary_totals():
+        return {
+            cid: (count, total)
+            for cid, count, total in db.query(
+                StudentGradeSummary.class_id,
+                func.count(StudentGradeSummary.id),
+                func.sum(StudentGradeSummary.final_grade),
+            ).join(
+                StudentClass,
+                (StudentClass.student_id == StudentGradeSummary.student_id)
+                & (StudentClass.class_id == StudentGradeSummary.class_id),
+            ).filter(
+                StudentGradeSummary.class_id.in_(class_ids)
+            ).group_by(StudentGradeSummary.class_id).all()
+        }
+
+    totals = summary_totals()
+    stale = [cid for cid in class_ids if totals.get(cid, (0, 0))[0] != student_counts.get(cid, 0)]
+    if stale:
+        for cid in stale:
+            ensure_grade_summaries(cid, db)
+        totals = summary_totals()
+
+    entries = []
+    for c in classes:
+        n = student_counts.get(c.id, 0)
+        total_grade = totals.get(c.id, (0, 0))[1] or 0.0
+        entries.append(ClassOverviewEntry(
+            class_id=c.id,
+            class_name=c.name,
+            class_code=c.code,
+            student_count=n,
+            pending_participation=pending.get(c.id, 0),
+            average_grade=(total_grade / n) if n > 0 else 0.0,
+        ))
+
+    return TeacherOverviewResponse(
+        total_classes=len(entries),
+        total_students=sum(e.student_count for e in entries),
+        pending_participation=sum(e.pending_participation for e in entries),
+        classes=entries,
+    )
+
+
+# ==================== Grade Simulation ====================
+
+def _load_simulation_base(class_: Class, db: Session) -> dict:
+    """Single load of a class's grade data, reused by every what-if scenario."""
+    students = db.query(Student.id, Student.name).join(
+        StudentClass, StudentClass.student_id == Student.id
+    ).filter(
+        StudentClass.class_id == class_.id
+    ).order_by(StudentClass.id).all()
+    student_ids = [sid for sid, _ in students]
+    activity = calc_activity_stats(class_.id, db, student_ids)
+    return {
+        "gradebook": Gradebook.load(class_.id, db, student_ids),
+        "names": dict(students),
+        "attendance": {
+            sid: activity.get(sid, EMPTY_ACTIVITY)["attendance_rate"] for sid in student_ids
+        },
+    }
+
+
+@router.post("/classes/{class_id}/simulate", response_model=GradeSimulationResponse)
+async def simulate_grades(
+    class_id: int,
+    data: GradeSimulationRequest,
+    class_: Class = Depends(get_owned_class),
+    db: Session = Depends(get_db),
+):
+    """Project final grades and status changes for hypothetical category
+    weights, extra grade items or participation factor. Nothing is saved."""
+    version = class_version(class_)
+    base = simulation_cache.get(class_id, version)
+    if base is None:
+        base = _load_simulation_base(class_, db)
+        simulation_cache.set(class_id, version, base)
+    gradebook = base["gradebook"]
+
+    unknown = (
+        set(data.category_weights)
+        | {item.category_id for item in data.extra_items if item.category_id is not None}
+    ) - set(gradebook.category_ids)
+    if unknown:
+        raise HTTPException(status_code=400, detail="Categoria no encontrada en esta clase")
+    if any(item.max_score <= 0 for item in data.extra_items):
+        raise HTTPException(status_code=400, detail="max_score debe ser mayor que 0")
+
+    scenario = gradebook.with_changes(
+        weights=data.category_weights,
+        extra_items=[
+            (item.category_id, item.score, item.max_score, item.student_ids)
+            for item in data.extra_items
+        ],
+        participation_factor=data.participation_factor,
+    )
+    current = gradebook.final_grades()
+    projected = scenario.final_grades()
+
+    results = []
+    for i, sid in enumerate(gradebook.student_ids):
+        att_rate = base["attendance"][sid]
+        results.append(SimulatedStudentGrade(
+            student_id=sid,
+            student_name=base["names"][sid],
+            current_grade=float(current[i]),
+            projected_grade=float(projected[i]),
+            delta=float(projected[i] - current[i]),
+            current_status=student_status(att_rate, float(current[i])),
+            projected_status=student_status(att_rate, float(projected[i])),
+        ))
+
+    n = len(results)
+    return GradeSimulationResponse(
+        class_id=class_id,
+        current_average=float(current.mean()) if n else 0.0,
+        projected_average=float(projected.mean()) if n else 0.0,
+        status_changes=sum(1 for r in results if r.current_status != r.projected_status),
+        students=results,
+    )
+
+
 # ==================== Assignments ====================
 
 @router.post("/assignments", response_model=AssignmentResponse)
@@ -960,11 +1033,7 @@ async def create_assignment(
     db: Session = Depends(get_db),
 ):
     """Create an assignment (reto) for a class."""
-    class_ = db.query(Class).filter(
-        Class.id == data.class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
+    if not owns_class(teacher.id, data.class_id, db, for_write=True):
         raise HTTPException(status_code=404, detail="Clase no encontrada")
 
     # Auto-find "Retos de la Semana" category
@@ -996,6 +1065,7 @@ async def create_assignment(
         max_points=data.max_points or 100,
     )
     db.add(assignment)
+    bump_class_version(db, data.class_id)
     db.commit()
     db.refresh(assignment)
 
@@ -1022,11 +1092,7 @@ async def list_assignments(
     db: Session = Depends(get_db),
 ):
     """List assignments for a class with submission counts."""
-    class_ = db.query(Class).filter(
-        Class.id == class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
+    if not owns_class(teacher.id, class_id, db):
         raise HTTPException(status_code=404, detail="Clase no encontrada")
 
     assignments = db.query(Assignment).filter(
@@ -1063,56 +1129,39 @@ async def list_assignments(
 
 @router.delete("/assignments/{assignment_id}")
 async def delete_assignment(
-    assignment_id: int,
-    teacher: Student = Depends(get_current_teacher),
+    assignment: Assignment = Depends(get_owned_assignment),
     db: Session = Depends(get_db),
 ):
     """Delete an assignment."""
-    assignment = db.query(Assignment).filter(
-        Assignment.id == assignment_id,
-    ).first()
-    if not assignment:
-        raise HTTPException(status_code=404, detail="Reto no encontrado")
-
-    # Verify teacher owns the class
-    class_ = db.query(Class).filter(
-        Class.id == assignment.class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
-        raise HTTPException(status_code=403, detail="No tienes permiso")
-
+    # Grades stay; unlink them from the submissions deleted with it (SQLite
+    # does not enforce ON DELETE SET NULL)
+    db.execute(
+        update(Grade)
+        .where(Grade.submission_id.in_(
+            select(Submission.id).where(Submission.assignment_id == assignment.id)
+        ))
+        .values(submission_id=None)
+        .execution_options(synchronize_session=False)
+    )
     db.delete(assignment)
+    bump_class_version(db, assignment.class_id)
     db.commit()
     return {"message": "Reto eliminado"}
 
 
 @router.get("/assignments/{assignment_id}/submissions", response_model=AssignmentSubmissionsResponse)
 async def get_assignment_submissions(
-    assignment_id: int,
+    assignment: Assignment = Depends(get_owned_assignment),
     filter: Optional[str] = None,
-    teacher: Student = Depends(get_current_teacher),
     db: Session = Depends(get_db),
 ):
     """Get all submissions for an assignment with student info."""
-    assignment = db.query(Assignment).filter(
-        Assignment.id == assignment_id,
-    ).first()
-    if not assignment:
-        raise HTTPException(status_code=404, detail="Reto no encontrado")
-
-    # Verify teacher owns the class
-    class_ = db.query(Class).filter(
-        Class.id == assignment.class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
-        raise HTTPException(status_code=403, detail="No tienes permiso")
-
     # Get all submissions with student info
-    submissions = db.query(Submission).filter(
-        Submission.assignment_id == assignment_id,
-    ).all()
+    submissions = db.query(Submission).options(
+        joinedload(Submission.student)
+    ).filter(
+        Submission.assignment_id == assignment.id,
+    ).order_by(Submission.student_id).all()
 
     # Apply filter
     if filter == "graded":
@@ -1126,7 +1175,7 @@ async def get_assignment_submissions(
     submission_responses = []
     submitter_ids = set()
     for s in submissions:
-        student = db.query(Student).filter(Student.id == s.student_id).first()
+        student = s.student
         if not student:
             continue
         submitter_ids.add(s.student_id)
@@ -1149,7 +1198,9 @@ async def get_assignment_submissions(
         ))
 
     # Build not_submitted list
-    enrolled = db.query(StudentClass).filter(
+    enrolled = db.query(StudentClass).options(
+        joinedload(StudentClass.student)
+    ).filter(
         StudentClass.class_id == assignment.class_id,
     ).all()
     total_enrolled = len(enrolled)
@@ -1179,33 +1230,51 @@ async def get_assignment_submissions(
     )
 
 
+def _upsert_submission_grades(db: Session, assignment: Assignment, graded: list) -> None:
+    """Insert or update the Grade row of each graded submission in one
+    statement, keyed on Grade.submission_id. graded: (submission_id,
+    student_id, score) tuples."""
+    category_name = "Retos de la Semana"
+    if assignment.category_id:
+        cat = db.query(GradeCategory).filter(GradeCategory.id == assignment.category_id).first()
+        if cat:
+            category_name = cat.name
+
+    stmt = dialect_insert(db, Grade).values([
+        {
+            "submission_id": submission_id,
+            "student_id": student_id,
+            "class_id": assignment.class_id,
+            "category_id": assignment.category_id,
+            "category": category_name,
+            "name": assignment.title,
+            "score": score,
+            "max_score": assignment.max_points,
+            "date": date.today(),
+        }
+        for submission_id, student_id, score in graded
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["submission_id"],
+        set_={
+            "category_id": stmt.excluded.category_id,
+            "category": stmt.excluded.category,
+            "name": stmt.excluded.name,
+            "score": stmt.excluded.score,
+            "max_score": stmt.excluded.max_score,
+        },
+    ))
+
+
 @router.patch("/submissions/{submission_id}/grade", response_model=SubmissionWithStudent)
 async def grade_submission(
-    submission_id: int,
     data: SubmissionGradeRequest,
+    submission: Submission = Depends(get_owned_submission),
     teacher: Student = Depends(get_current_teacher),
     db: Session = Depends(get_db),
 ):
     """Grade a single submission and upsert the corresponding Grade record."""
-    submission = db.query(Submission).filter(
-        Submission.id == submission_id,
-    ).first()
-    if not submission:
-        raise HTTPException(status_code=404, detail="Entrega no encontrada")
-
-    assignment = db.query(Assignment).filter(
-        Assignment.id == submission.assignment_id,
-    ).first()
-    if not assignment:
-        raise HTTPException(status_code=404, detail="Reto no encontrado")
-
-    # Verify teacher owns the class
-    class_ = db.query(Class).filter(
-        Class.id == assignment.class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
-        raise HTTPException(status_code=403, detail="No tienes permiso")
+    assignment = submission.assignment
 
     # Validate score
     if data.score < 0 or data.score > assignment.max_points:
@@ -1220,38 +1289,10 @@ async def grade_submission(
     submission.graded_at = dt.utcnow()
     submission.graded_by = teacher.id
 
-    # Resolve category name from assignment's category_id
-    category_name = "Retos de la Semana"
-    if assignment.category_id:
-        cat = db.query(GradeCategory).filter(GradeCategory.id == assignment.category_id).first()
-        if cat:
-            category_name = cat.name
-
-    # Upsert Grade record
-    existing_grade = db.query(Grade).filter(
-        Grade.student_id == submission.student_id,
-        Grade.class_id == assignment.class_id,
-        Grade.name == assignment.title,
-    ).first()
-
-    if existing_grade:
-        existing_grade.score = data.score
-        existing_grade.max_score = assignment.max_points
-        existing_grade.category_id = assignment.category_id
-        existing_grade.category = category_name
-    else:
-        grade = Grade(
-            student_id=submission.student_id,
-            class_id=assignment.class_id,
-            category_id=assignment.category_id,
-            category=category_name,
-            name=assignment.title,
-            score=data.score,
-            max_score=assignment.max_points,
-            date=date.today(),
-        )
-        db.add(grade)
+    _upsert_submission_grades(db, assignment, [(submission.id, submission.student_id, data.score)])
 
+    refresh_grade_summaries(assignment.class_id, db, [submission.student_id])
+    bump_class_version(db, assignment.class_id)
     db.commit()
     db.refresh(submission)
 
@@ -1278,77 +1319,36 @@ async def grade_submission(
 
 @router.post("/assignments/{assignment_id}/auto-grade", response_model=AutoGradeResult)
 async def auto_grade_assignment(
-    assignment_id: int,
+    assignment: Assignment = Depends(get_owned_assignment),
     teacher: Student = Depends(get_current_teacher),
     db: Session = Depends(get_db),
 ):
     """Auto-grade all ungraded submissions using penalty_pct * max_points."""
-    assignment = db.query(Assignment).filter(
-        Assignment.id == assignment_id,
-    ).first()
-    if not assignment:
-        raise HTTPException(status_code=404, detail="Reto no encontrado")
-
-    # Verify teacher owns the class
-    class_ = db.query(Class).filter(
-        Class.id == assignment.class_id,
-        Class.teacher_id == teacher.id,
-    ).first()
-    if not class_:
-        raise HTTPException(status_code=403, detail="No tienes permiso")
-
-    # Resolve category name from assignment's category_id
-    category_name = "Retos de la Semana"
-    if assignment.category_id:
-        cat = db.query(GradeCategory).filter(GradeCategory.id == assignment.category_id).first()
-        if cat:
-            category_name = cat.name
-
-    # Get ungraded submissions
-    ungraded = db.query(Submission).filter(
-        Submission.assignment_id == assignment_id,
-        Submission.grade.is_(None),
+    # Grade every ungraded submission in one UPDATE, then their Grade rows
+    # in one upsert: the statement count does not grow with submissions
+    graded = db.execute(
+        update(Submission)
+        .where(
+            Submission.assignment_id == assignment.id,
+            Submission.grade.is_(None),
+        )
+        .values(
+            grade=Submission.penalty_pct / 100.0 * assignment.max_points,
+            graded_at=dt.utcnow(),
+            graded_by=teacher.id,
+        )
+        .returning(Submission.id, Submission.student_id, Submission.grade)
+        .execution_options(synchronize_session=False)
     ).all()
 
-    graded_count = 0
-    skipped_count = 0
-
-    for s in ungraded:
-        score = (s.penalty_pct / 100) * assignment.max_points
-        s.grade = score
-        s.graded_at = dt.utcnow()
-        s.graded_by = teacher.id
-
-        # Upsert Grade record
-        existing_grade = db.query(Grade).filter(
-            Grade.student_id == s.student_id,
-            Grade.class_id == assignment.class_id,
-            Grade.name == assignment.title,
-        ).first()
-
-        if existing_grade:
-            existing_grade.score = score
-            existing_grade.max_score = assignment.max_points
-            existing_grade.category_id = assignment.category_id
-            existing_grade.category = category_name
-        else:
-            grade = Grade(
-                student_id=s.student_id,
-                class_id=assignment.class_id,
-                category_id=assignment.category_id,
-                category=category_name,
-                name=assignment.title,
-                score=score,
-                max_score=assignment.max_points,
-                date=date.today(),
-            )
-            db.add(grade)
-
-        graded_count += 1
+    if graded:
+        _upsert_submission_grades(db, assignment, graded)
 
+    refresh_grade_summaries(assignment.class_id, db, [g.student_id for g in graded])
+    bump_class_version(db, assignment.class_id)
     db.commit()
 
     return AutoGradeResult(
-        graded_count=graded_count,
-        skipped_count=skipped_count,
+        graded_count=len(graded),
+        skipped_count=0,
     )
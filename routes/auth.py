@@ -41,7 +41,7 @@ async def google_auth(request: GoogleAuthRequest, db: Session = Depends(get_db))
     student = find_or_create_student(db, google_info)
 
     # Create a session
-    session_token = create_session(student.id)
+    session_token = create_session(student.id, student.role)
 
     return AuthResponse(
         token=session_token,
@@ -6,7 +6,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 
 from models.database import get_db
-from models.models import Student, Class, StudentClass, GradeCategory
+from models.models import Student, Class, StudentClass, GradeCategory, StudentGradeSummary
 from models.schemas import (
     ClassCreate,
     ClassResponse,
@@ -16,6 +16,8 @@ from models.schemas import (
     StudentResponse,
 )
 from app.auth import get_current_student, get_current_teacher, get_student_or_impersonated
+from app.cache import bump_class_version, dashboard_cache
+from app.grading import refresh_grade_summaries
 
 router = APIRouter(prefix="/api/classes", tags=["classes"])
 
@@ -146,6 +148,7 @@ async def delete_class(
 
     db.delete(class_)
     db.commit()
+    dashboard_cache.discard(class_id)
 
     return {"message": "Clase eliminada exitosamente"}
 
@@ -210,6 +213,8 @@ async def join_class(
         class_id=class_.id,
     )
     db.add(enrollment)
+    refresh_grade_summaries(class_.id, db, [student.id])
+    bump_class_version(db, class_.id)
     db.commit()
     db.refresh(enrollment)
 
@@ -241,6 +246,11 @@ async def leave_class(
         )
 
     db.delete(enrollment)
+    db.query(StudentGradeSummary).filter(
+        StudentGradeSummary.student_id == student.id,
+        StudentGradeSummary.class_id == class_id,
+    ).delete()
+    bump_class_version(db, class_id)
     db.commit()
 
     return {"message": "Has salido de la clase exitosamente"}
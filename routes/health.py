@@ -5,11 +5,13 @@ Debug endpoints are protected by SECRET_KEY passed as X-Debug-Token header.
 import os
 import sys
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import inspect as sa_inspect, text
 
-from models.database import get_db
+from models.database import get_db, get_pool_stats
+from app.auth import principal_cache, session_store
+from app.query_stats import statement_stats
 
 logger = logging.getLogger(__name__)
 
@@ -107,3 +109,30 @@ async def debug_test_queries(
             results[name] = {"status": "error", "error": str(e)}
 
     return results
+
+
+@router.get("/debug/auth-cache")
+async def debug_auth_cache(_=Depends(verify_debug_token)):
+    """Principal cache size and hit rate."""
+    return principal_cache.stats()
+
+
+@router.get("/debug/sessions")
+async def debug_sessions(_=Depends(verify_debug_token)):
+    """Session count, expiry settings and eviction counters."""
+    return session_store.stats()
+
+
+@router.get("/debug/db-pool")
+async def debug_db_pool(_=Depends(verify_debug_token)):
+    """Connection pool usage, overflow and checkout wait times per engine."""
+    return get_pool_stats()
+
+
+@router.get("/debug/queries")
+async def debug_queries(
+    limit: int = Query(50, ge=1, le=500),
+    _=Depends(verify_debug_token),
+):
+    """Statement shapes by total DB time with p50/p95/p99, and recent slow queries."""
+    return statement_stats.stats(limit)
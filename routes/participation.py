@@ -6,6 +6,8 @@ from models.database import get_db
 from models.models import Student, Participation, StudentClass
 from models.schemas import ParticipationCreate, ParticipationResponse
 from app.auth import get_current_student
+from app.grading import refresh_grade_summaries
+from app.cache import bump_class_version
 
 router = APIRouter(prefix="/api", tags=["participation"])
 
@@ -37,6 +39,8 @@ async def submit_participation(
         points=participation.points
     )
     db.add(db_participation)
+    refresh_grade_summaries(participation.class_id, db, [current_student.id])
+    bump_class_version(db, participation.class_id)
     db.commit()
     db.refresh(db_participation)
     return db_participation
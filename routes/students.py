@@ -1,17 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
 from typing import List, Optional
 import logging
 
-from models.database import get_db
-from models.models import Student, Attendance, Grade, Participation, StudentClass, GradeCategory, SpecialPoints, Assignment, Submission
+from models.database import get_db, get_async_db
+from models.models import Student, Attendance, Grade, Participation, StudentClass, Class, Assignment, Submission
 from models.schemas import (
     StudentResponse, AttendanceResponse, GradeResponse, ParticipationResponse,
-    CategoryGradeBreakdown, SpecialPointsResponse,
     AssignmentStudentView, SubmissionCreate, SubmissionResponse,
 )
 from app.auth import get_current_student, get_student_or_impersonated
+from app.cache import class_version, class_version_bump
+from app.grading import get_grade_calculations
 
 logger = logging.getLogger(__name__)
 
@@ -95,112 +97,36 @@ async def get_student_participation_points(
 async def get_student_grade_calculation(
     class_id: int,
     current_student: Student = Depends(get_student_or_impersonated),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get grade calculation breakdown for a class using category weights."""
-    enrollment = db.query(StudentClass).filter(
-        StudentClass.student_id == current_student.id,
-        StudentClass.class_id == class_id,
-    ).first()
-    if not enrollment:
+    class_ = (await db.execute(
+        select(Class).join(
+            StudentClass, StudentClass.class_id == Class.id
+        ).where(
+            StudentClass.student_id == current_student.id,
+            StudentClass.class_id == class_id,
+        )
+    )).scalars().first()
+    if not class_:
         raise HTTPException(status_code=404, detail="No estas inscrito en esta clase")
 
-    # Categories
-    categories = db.query(GradeCategory).filter(
-        GradeCategory.class_id == class_id
-    ).all()
-
-    # All grades for this student/class
-    all_grades = db.query(Grade).filter(
-        Grade.student_id == current_student.id,
-        Grade.class_id == class_id,
-    ).all()
-
-    category_breakdowns = []
-    weighted_sum = 0.0
-
-    for cat in categories:
-        cat_grades = [g for g in all_grades if g.category_id == cat.id]
-        valid = [g for g in cat_grades if g.max_score and g.max_score > 0]
-        avg = (sum((g.score / g.max_score) * 100 for g in valid) / len(valid)) if valid else 0.0
-        contribution = avg * cat.weight
-        weighted_sum += contribution
-
-        # Assignment counts for this category
-        cat_assignments = db.query(Assignment).filter(
-            Assignment.class_id == class_id,
-            Assignment.category_id == cat.id,
-            Assignment.published == True,
-        ).all()
-        total_assignments = len(cat_assignments)
-
-        graded_count = 0
-        pending_count = 0
-        for a in cat_assignments:
-            sub = db.query(Submission).filter(
-                Submission.assignment_id == a.id,
-                Submission.student_id == current_student.id,
-            ).first()
-            if sub and sub.grade is not None:
-                graded_count += 1
-            elif sub:
-                pending_count += 1
-
-        category_breakdowns.append(CategoryGradeBreakdown(
-            category_id=cat.id,
-            category_name=cat.name,
-            weight=cat.weight,
-            grades=[GradeResponse(
-                id=g.id, student_id=g.student_id, category_id=g.category_id,
-                category=g.category, name=g.name, score=g.score,
-                max_score=g.max_score, date=g.date,
-            ) for g in cat_grades],
-            average=avg,
-            weighted_contribution=contribution,
-            graded_count=graded_count,
-            pending_count=pending_count,
-            total_assignments=total_assignments,
-        ))
-
-    # Fallback if no categories
-    if not categories:
-        valid = [g for g in all_grades if g.max_score and g.max_score > 0]
-        weighted_sum = (sum((g.score / g.max_score) * 100 for g in valid) / len(valid)) if valid else 0.0
-
-    # Participation (no cap)
-    part_pts = db.query(func.sum(Participation.points)).filter(
-        Participation.student_id == current_student.id,
-        Participation.class_id == class_id,
-        Participation.approved == "approved",
-    ).scalar() or 0
-
-    part_contribution = 0.1 * int(part_pts)
-
-    # Special points
-    sp_records = db.query(SpecialPoints).filter(
-        SpecialPoints.student_id == current_student.id,
-        SpecialPoints.class_id == class_id,
-    ).all()
-    sp_total = sum(sp.points_value for sp in sp_records if sp.opted_in and sp.awarded)
-
-    sp_responses = [SpecialPointsResponse(
-        id=sp.id, student_id=sp.student_id, class_id=sp.class_id,
-        category=sp.category, opted_in=sp.opted_in, awarded=sp.awarded,
-        points_value=sp.points_value, created_at=sp.created_at,
-    ) for sp in sp_records]
-
-    final_grade = weighted_sum + part_contribution + sp_total
+    version = class_version(class_)
+    student_id = current_student.id
+    gd = (await db.run_sync(
+        lambda sync_db: get_grade_calculations(class_id, sync_db, [student_id], version)
+    ))[student_id]
 
     return {
         "student_id": current_student.id,
         "student_name": current_student.name,
         "student_email": current_student.email,
-        "categories": [cb.model_dump() for cb in category_breakdowns],
-        "participation_points": int(part_pts),
-        "participation_contribution": part_contribution,
-        "special_points": [sp.model_dump() for sp in sp_responses],
-        "special_points_total": sp_total,
-        "final_grade": final_grade,
+        "categories": [cb.model_dump() for cb in gd["category_breakdowns"]],
+        "participation_points": gd["participation_points"],
+        "participation_contribution": gd["participation_contribution"],
+        "special_points": [sp.model_dump() for sp in gd["special_points"]],
+        "special_points_total": gd["special_points_total"],
+        "final_grade": gd["final_grade"],
     }
 
 
@@ -208,20 +134,30 @@ async def get_student_grade_calculation(
 async def get_student_assignments(
     class_id: int,
     current_student: Student = Depends(get_student_or_impersonated),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get assignments for a class with the student's submission status."""
-    assignments = db.query(Assignment).filter(
-        Assignment.class_id == class_id,
-        Assignment.published == True,
-    ).order_by(Assignment.due_date.asc()).all()
+    assignments = (await db.execute(
+        select(Assignment).where(
+            Assignment.class_id == class_id,
+            Assignment.published == True,
+        ).order_by(Assignment.due_date.asc())
+    )).scalars().all()
+
+    # One query for the student's submissions to all of them
+    submissions = {
+        sub.assignment_id: sub
+        for sub in (await db.execute(
+            select(Submission).where(
+                Submission.assignment_id.in_([a.id for a in assignments]),
+                Submission.student_id == current_student.id,
+            )
+        )).scalars()
+    }
 
     results = []
     for a in assignments:
-        submission = db.query(Submission).filter(
-            Submission.assignment_id == a.id,
-            Submission.student_id == current_student.id,
-        ).first()
+        submission = submissions.get(a.id)
 
         sub_response = None
         if submission:
@@ -259,29 +195,35 @@ async def submit_assignment(
     assignment_id: int,
     data: SubmissionCreate,
     current_student: Student = Depends(get_student_or_impersonated),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Submit an assignment."""
-    assignment = db.query(Assignment).filter(
-        Assignment.id == assignment_id,
-        Assignment.published == True,
-    ).first()
+    assignment = (await db.execute(
+        select(Assignment).where(
+            Assignment.id == assignment_id,
+            Assignment.published == True,
+        )
+    )).scalars().first()
     if not assignment:
         raise HTTPException(status_code=404, detail="Reto no encontrado")
 
     # Verify student is enrolled
-    enrollment = db.query(StudentClass).filter(
-        StudentClass.student_id == current_student.id,
-        StudentClass.class_id == assignment.class_id,
-    ).first()
+    enrollment = (await db.execute(
+        select(StudentClass.id).where(
+            StudentClass.student_id == current_student.id,
+            StudentClass.class_id == assignment.class_id,
+        )
+    )).first()
     if not enrollment:
         raise HTTPException(status_code=403, detail="No estas inscrito en esta clase")
 
     # Check for existing submission
-    existing = db.query(Submission).filter(
-        Submission.assignment_id == assignment_id,
-        Submission.student_id == current_student.id,
-    ).first()
+    existing = (await db.execute(
+        select(Submission.id).where(
+            Submission.assignment_id == assignment_id,
+            Submission.student_id == current_student.id,
+        )
+    )).first()
     if existing:
         raise HTTPException(status_code=400, detail="Ya enviaste este reto")
 
@@ -309,8 +251,9 @@ async def submit_assignment(
         penalty_pct=penalty_pct,
     )
     db.add(submission)
-    db.commit()
-    db.refresh(submission)
+    await db.execute(class_version_bump(assignment.class_id))
+    await db.commit()
+    await db.refresh(submission)
 
     return SubmissionResponse(
         id=submission.id,
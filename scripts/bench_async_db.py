@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Benchmark mixed dashboard + submit traffic on the sync and async DB paths.
+
+Seeds a SQLite file with one class (see bench_gradebook.seed) and sends
+concurrent requests through the ASGI app on one event loop, as a single
+uvicorn worker would see them:
+  - baseline: dashboard and submit handlers querying through the sync
+    Session inside async def (the previous implementation, kept here)
+  - async:    the real routes: handlers on AsyncSession (aiosqlite), auth
+              dependencies on the sync Session in the threadpool
+
+Submits bump the class version, so dashboards keep rebuilding their
+class-wide stats, as during a class where students are handing in work.
+
+Keep --concurrency below the pool size plus overflow (15 by default): past
+that the baseline blocks the event loop waiting for a connection that only
+a request queued behind it would return, and stalls until the pool timeout.
+
+Usage:
+    python scripts/bench_async_db.py
+    python scripts/bench_async_db.py --students 500 --requests 600 --concurrency 15
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import shutil
+import statistics
+import tempfile
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Point the app at a scratch database before models.database is imported
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from models.database import Base, SessionLocal, engine, get_async_engine, get_db
+from models.models import Student, Class, StudentClass, Assignment, Submission
+from models.schemas import SubmissionCreate
+from app.auth import Principal, create_session, lookup_session, principal_cache, security
+from app.cache import bump_class_version, class_version, dashboard_cache
+from app.grading import ensure_grade_summaries
+from app.main import app
+from routes.admin import _build_dashboard, _dashboard_queries, _dashboard_rows
+from bench_gradebook import seed
+
+
+async def baseline_student(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db),
+) -> Student:
+    """The auth dependency as it was: principal cache, then the sync Session."""
+    token = credentials.credentials
+    principal = principal_cache.get(token)
+    if principal is not None:
+        student = Student(**principal._asdict())
+        make_transient_to_detached(student)
+        return db.merge(student, load=False)
+    student = db.get(Student, lookup_session(token))
+    principal_cache.set(token, Principal(
+        id=student.id, name=student.name, email=student.email, role=student.role,
+        oauth_id=student.oauth_id, created_at=student.created_at,
+    ))
+    return student
+
+
+def baseline_app() -> FastAPI:
+    """The two hot handlers as they were: sync Session calls in async def."""
+    base = FastAPI()
+
+    @base.get("/api/admin/classes/{class_id}/dashboard")
+    async def dashboard(
+        class_id: int,
+        teacher: Student = Depends(baseline_student),
+        db: Session = Depends(get_db),
+    ):
+        class_ = db.query(Class).filter(Class.id == class_id, Class.teacher_id == teacher.id).first()
+        ensure_grade_summaries(class_id, db)
+        version = class_version(class_)
+        payload = dashboard_cache.get(class_id, version)
+        if payload is None:
+            payload = _build_dashboard(class_, db)
+            dashboard_cache.set(class_id, version, payload)
+        stats_query, rows_query = _dashboard_queries(class_id, "name", "asc", None, None, None, 0)
+        filtered_count, at_risk, top = db.execute(stats_query).one()
+        return {"stats": payload["stats"], "students": _dashboard_rows(db.execute(rows_query).all())}
+
+    @base.post("/api/students/me/assignments/{assignment_id}/submit")
+    async def submit(
+        assignment_id: int,
+        data: SubmissionCreate,
+        current_student: Student = Depends(baseline_student),
+        db: Session = Depends(get_db),
+    ):
+        assignment = db.query(Assignment).filter(
+            Assignment.id == assignment_id, Assignment.published == True,
+        ).first()
+        enrollment = db.query(StudentClass).filter(
+            StudentClass.student_id == current_student.id,
+            StudentClass.class_id == assignment.class_id,
+        ).first()
+        if not enrollment:
+            raise HTTPException(status_code=403, detail="No estas inscrito en esta clase")
+        if db.query(Submission).filter(
+            Submission.assignment_id == assignment_id,
+            Submission.student_id == current_student.id,
+        ).first():
+            raise HTTPException(status_code=400, detail="Ya enviaste este reto")
+        submission = Submission(assignment_id=assignment_id, student_id=current_student.id, drive_url=data.drive_url)
+        db.add(submission)
+        bump_class_version(db, assignment.class_id)
+        db.commit()
+        db.refresh(submission)
+        return {"id": submission.id}
+
+    return base
+
+
+async def run_traffic(target: FastAPI, plan: list, concurrency: int) -> tuple[float, dict]:
+    """Send the planned requests with at most `concurrency` in flight."""
+    latencies = {"dashboard": [], "submit": []}
+    queue = list(reversed(plan))
+    transport = httpx.ASGITransport(app=target)
+
+    async def worker(client):
+        while queue:
+            kind, method, url, headers, body = queue.pop()
+            start = time.perf_counter()
+            r = await client.request(method, url, headers=headers, json=body)
+            assert r.status_code in (200, 400), r.text
+            latencies[kind].append(time.perf_counter() - start)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async DB path under mixed traffic")
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=12)
+    parser.add_argument("--dashboard-share", type=float, default=0.25)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    class_id = seed(db, args.students)
+    teacher_id = db.query(Class.teacher_id).filter(Class.id == class_id).scalar()
+    student_ids = [sid for (sid,) in db.query(StudentClass.student_id).filter(StudentClass.class_id == class_id)]
+    assignment_ids = [aid for (aid,) in db.query(Assignment.id).filter(Assignment.class_id == class_id)]
+    # Summary rows exist in a running class; creating them is a one-off write
+    ensure_grade_summaries(class_id, db)
+    db.close()
+    engine.dispose()
+    pristine = DB_PATH + ".pristine"
+    shutil.copy(DB_PATH, pristine)
+
+    rnd = random.Random(0)
+    teacher_headers = {"Authorization": f"Bearer {create_session(teacher_id)}"}
+    student_headers = {sid: {"Authorization": f"Bearer {create_session(sid)}"} for sid in student_ids}
+    plan = []
+    for _ in range(args.requests):
+        if rnd.random() < args.dashboard_share:
+            plan.append(("dashboard", "GET", f"/api/admin/classes/{class_id}/dashboard", teacher_headers, None))
+        else:
+            sid = rnd.choice(student_ids)
+            plan.append((
+                "submit", "POST", f"/api/students/me/assignments/{rnd.choice(assignment_ids)}/submit",
+                student_headers[sid], {"drive_url": "https://drive.google.com/bench"},
+            ))
+
+    print(f"{args.students} students, {args.requests} requests "
+          f"({args.dashboard_share:.0%} dashboard), concurrency {args.concurrency}")
+    print(f"{'path':>8} {'req/s':>7} {'dash p50':>9} {'dash p95':>9} {'submit p50':>11} {'submit p95':>11}")
+    for name, target in (("baseline", baseline_app()), ("async", app)):
+        engine.dispose()
+        asyncio.run(get_async_engine().dispose())
+        shutil.copy(pristine, DB_PATH)
+        dashboard_cache.clear()
+        principal_cache.clear()
+
+        elapsed, latencies = asyncio.run(run_traffic(target, plan, args.concurrency))
+
+        def pct(values, q):
+            return statistics.quantiles(values, n=100)[q - 1] * 1000 if len(values) > 1 else 0.0
+
+        print(f"{name:>8} {args.requests / elapsed:>7.0f} "
+              f"{pct(latencies['dashboard'], 50):>7.1f}ms {pct(latencies['dashboard'], 95):>7.1f}ms "
+              f"{pct(latencies['submit'], 50):>9.1f}ms {pct(latencies['submit'], 95):>9.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
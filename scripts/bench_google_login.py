@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Benchmark Google ID token verification with and without the cert cache.
+
+Serves self-signed certificates from a local stand-in for Google's certs
+endpoint (with an artificial network delay and a Cache-Control max-age),
+signs ID tokens with the matching private keys, and times a burst of
+concurrent logins:
+  - uncached: id_token.verify_token, which fetches the certs every call
+  - cached:   verify_google_id_token with a shared GoogleCertCache
+
+Then checks, with asserts that fail the run:
+  - a rotated key is picked up with one extra fetch, and unknown key ids
+    do not refetch more than once per MIN_FORCED_REFRESH_INTERVAL
+  - expired certs are refetched before use, certs close to expiry are
+    refreshed in the background, and expired tokens are rejected
+  - an endpoint outage raises TransportError when no certs are usable, and
+    a failed background refresh keeps the current certs and backs off
+
+Usage:
+    python scripts/bench_google_login.py
+    python scripts/bench_google_login.py --logins 40 --latency-ms 150
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, exceptions, jwt
+from google.auth.transport import requests
+from google.oauth2 import id_token
+
+from app import google_certs
+from app.google_certs import GoogleCertCache, verify_google_id_token
+
+AUDIENCE = "bench-client-id.apps.googleusercontent.com"
+
+
+def make_key(kid: str) -> tuple[crypt.RSASigner, str]:
+    """RSA signer plus the PEM of a self-signed certificate for it."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, kid)])
+    now = datetime.now(timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    signer = crypt.RSASigner.from_string(private_pem, key_id=kid)
+    return signer, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+def start_cert_server(certs: dict, latency: float, max_age: int) -> tuple[ThreadingHTTPServer, dict]:
+    """Local certs endpoint; returns the server and a hit counter (set
+    hits["status"] to make it fail)."""
+    hits = {"count": 0, "status": 200}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits["count"] += 1
+            time.sleep(latency)
+            if hits["status"] != 200:
+                self.send_response(hits["status"])
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.dumps(certs).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Cache-Control", f"public, max-age={max_age}, must-revalidate")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, hits
+
+
+def make_token(signer: crypt.RSASigner, n: int, expires_in: int = 3600) -> str:
+    now = int(time.time())
+    return jwt.encode(signer, {
+        "iss": "https://accounts.google.com",
+        "aud": AUDIENCE,
+        "sub": str(100000 + n),
+        "email": f"student{n}@example.com",
+        "iat": min(now, now + expires_in - 60),
+        "exp": now + expires_in,
+    }).decode()
+
+
+def run_burst(verify, tokens: list[str]) -> float:
+    """Verify all tokens concurrently; returns wall time in seconds."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(tokens)) as pool:
+        results = list(pool.map(verify, tokens))
+    elapsed = time.perf_counter() - start
+    assert all(r["aud"] == AUDIENCE for r in results)
+    return elapsed
+
+
+def rejected(token: str, cache: GoogleCertCache) -> bool:
+    try:
+        verify_google_id_token(token, AUDIENCE, cache)
+    except ValueError:
+        return True
+    return False
+
+
+def wait_for_refresh(cache: GoogleCertCache, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while cache._refreshing:
+        assert time.monotonic() < deadline, "background refresh did not finish"
+        time.sleep(0.01)
+
+
+def check_rotation(cache: GoogleCertCache, certs: dict, hits: dict, signer: crypt.RSASigner) -> None:
+    """A new key id is fetched once; unknown ones are rate limited."""
+    hits["count"] = 0
+    new_signer, new_cert = make_key("key-2")
+    certs["key-2"] = new_cert
+    cache._fetched_at -= google_certs.MIN_FORCED_REFRESH_INTERVAL
+    verify_google_id_token(make_token(new_signer, 0), AUDIENCE, cache)
+    assert hits["count"] == 1, f"rotated key took {hits['count']} fetches, expected 1"
+    verify_google_id_token(make_token(signer, 0), AUDIENCE, cache)
+
+    hits["count"] = 0
+    unknown_signer, _ = make_key("key-unpublished")
+    for n in range(5):
+        assert rejected(make_token(unknown_signer, n), cache), "token with unpublished key accepted"
+    assert hits["count"] == 0, f"unknown key ids caused {hits['count']} fetches within the interval"
+
+
+def check_expiry(url: str, hits: dict, signer: crypt.RSASigner) -> None:
+    """Expired certs are refetched, near-expiry ones refreshed in the
+    background, and expired tokens rejected."""
+    cache = GoogleCertCache(url=url)
+    verify_google_id_token(make_token(signer, 0), AUDIENCE, cache)
+
+    hits["count"] = 0
+    cache._expires_at = time.monotonic() - 1
+    verify_google_id_token(make_token(signer, 0), AUDIENCE, cache)
+    assert hits["count"] == 1, f"expired certs took {hits['count']} fetches, expected 1"
+
+    hits["count"] = 0
+    cache._refresh_at = time.monotonic() - 1
+    for n in range(10):
+        verify_google_id_token(make_token(signer, n), AUDIENCE, cache)
+    wait_for_refresh(cache)
+    assert hits["count"] == 1, f"background refresh made {hits['count']} fetches, expected 1"
+    assert cache._refresh_at > time.monotonic(), "refresh time not moved forward"
+
+    assert rejected(make_token(signer, 0, expires_in=-3600), cache), "expired token accepted"
+
+
+def check_outage(url: str, hits: dict, signer: crypt.RSASigner) -> None:
+    """No usable certs: TransportError. Stale-soon certs: keep them, back off."""
+    hits["status"] = 503
+    try:
+        cache = GoogleCertCache(url=url)
+        try:
+            verify_google_id_token(make_token(signer, 0), AUDIENCE, cache)
+        except exceptions.TransportError:
+            pass
+        else:
+            raise AssertionError("verified a token without certificates")
+    finally:
+        hits["status"] = 200
+
+    cache = GoogleCertCache(url=url)
+    verify_google_id_token(make_token(signer, 0), AUDIENCE, cache)
+    hits["status"] = 503
+    try:
+        hits["count"] = 0
+        cache._refresh_at = time.monotonic() - 1
+        verify_google_id_token(make_token(signer, 0), AUDIENCE, cache)
+        wait_for_refresh(cache)
+        for n in range(10):
+            verify_google_id_token(make_token(signer, n), AUDIENCE, cache)
+        wait_for_refresh(cache)
+        assert hits["count"] == 1, f"failed refresh retried {hits['count']} times within the backoff"
+        assert cache._refresh_at >= time.monotonic() + google_certs.REFRESH_RETRY_INTERVAL - 5, \
+            "failed refresh did not back off"
+    finally:
+        hits["status"] = 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Google login verification benchmark")
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--max-age", type=int, default=21600)
+    args = parser.parse_args()
+
+    signer, cert = make_key("key-1")
+    certs = {"key-1": cert}
+    server, hits = start_cert_server(certs, args.latency_ms / 1000, args.max_age)
+    url = f"http://127.0.0.1:{server.server_port}/oauth2/v1/certs"
+    tokens = [make_token(signer, n) for n in range(args.logins)]
+
+    request = requests.Request()
+    uncached_s = run_burst(
+        lambda t: id_token.verify_token(t, request, audience=AUDIENCE, certs_url=url), tokens
+    )
+    uncached_hits, hits["count"] = hits["count"], 0
+
+    cache = GoogleCertCache(url=url)
+    cold_s = run_burst(lambda t: verify_google_id_token(t, AUDIENCE, cache), tokens)
+    cold_hits, hits["count"] = hits["count"], 0
+    warm_s = run_burst(lambda t: verify_google_id_token(t, AUDIENCE, cache), tokens)
+    warm_hits, hits["count"] = hits["count"], 0
+
+    print(f"{args.logins} concurrent logins, {args.latency_ms:.0f}ms cert endpoint latency")
+    print(f"{'path':>14} {'burst':>9} {'per login':>10} {'fetches':>8}")
+    for name, elapsed, fetches in (
+        ("uncached", uncached_s, uncached_hits),
+        ("cached (cold)", cold_s, cold_hits),
+        ("cached (warm)", warm_s, warm_hits),
+    ):
+        print(f"{name:>14} {elapsed * 1000:>7.1f}ms {elapsed / args.logins * 1000:>8.2f}ms {fetches:>8}")
+
+    check_rotation(cache, certs, hits, signer)
+    check_expiry(url, hits, signer)
+    check_outage(url, hits, signer)
+    print("rotation, expiry and outage checks OK")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Benchmark the vectorized gradebook against the per-student grade path.
+
+Seeds an in-memory SQLite database with one class per size and times:
+  - per-student: the original _calc_grade approach (queries and list
+    comprehensions over ORM objects, one student at a time)
+  - gradebook:   Gradebook.load() + final_grades() for the whole class
+
+Usage:
+    python scripts/bench_gradebook.py                  # 50, 500 and 5000 students
+    python scripts/bench_gradebook.py --sizes 50 500   # Custom sizes
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import date, datetime, timedelta
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models.database import Base
+from models.models import (
+    Student, Class, StudentClass, Grade, GradeCategory, Participation,
+    SpecialPoints, Assignment, Submission,
+)
+from app.gradebook import Gradebook
+
+GRADES_PER_STUDENT = 20
+ASSIGNMENTS = 20
+
+
+def seed(db, n_students: int) -> int:
+    """Create one class with n_students and realistic grade data."""
+    rnd = random.Random(n_students)
+    teacher = Student(name="Teacher", email=f"teacher{n_students}@bench", role="teacher")
+    db.add(teacher)
+    db.flush()
+    class_ = Class(name=f"Bench {n_students}", code=f"BENCH{n_students}", teacher_id=teacher.id)
+    db.add(class_)
+    db.flush()
+    cats = [
+        GradeCategory(class_id=class_.id, name="Retos de la Semana", weight=0.4),
+        GradeCategory(class_id=class_.id, name="Exámenes y Proyectos", weight=0.4),
+    ]
+    db.add_all(cats)
+    db.flush()
+    assignments = [
+        Assignment(
+            class_id=class_.id, category_id=cats[i % 2].id, title=f"Reto {i}",
+            due_date=datetime(2026, 1, 4) + timedelta(weeks=i), max_points=100,
+        )
+        for i in range(ASSIGNMENTS)
+    ]
+    db.add_all(assignments)
+    db.flush()
+
+    students = [Student(name=f"Student {i}", email=f"s{i}-{n_students}@bench") for i in range(n_students)]
+    db.add_all(students)
+    db.flush()
+
+    rows = {"enroll": [], "grades": [], "parts": [], "special": [], "subs": []}
+    for s in students:
+        rows["enroll"].append({"student_id": s.id, "class_id": class_.id})
+        for g in range(GRADES_PER_STUDENT):
+            rows["grades"].append({
+                "student_id": s.id, "class_id": class_.id, "category_id": cats[g % 2].id,
+                "name": f"Reto {g}", "score": rnd.uniform(40, 100), "max_score": 100,
+                "date": date(2026, 2, 1) + timedelta(days=g),
+            })
+        for p in range(3):
+            rows["parts"].append({
+                "student_id": s.id, "class_id": class_.id, "date": date(2026, 2, 1),
+                "description": "bench", "points": rnd.randint(1, 3),
+                "approved": rnd.choice(["approved", "pending"]),
+            })
+        rows["special"].append({
+            "student_id": s.id, "class_id": class_.id, "category": "english",
+            "opted_in": True, "awarded": rnd.random() < 0.5, "points_value": 0.5,
+        })
+        for a in assignments:
+            if rnd.random() < 0.8:
+                rows["subs"].append({
+                    "assignment_id": a.id, "student_id": s.id, "drive_url": "https://drive",
+                    "grade": rnd.choice([None, rnd.uniform(0, 100)]),
+                })
+
+    db.bulk_insert_mappings(StudentClass, rows["enroll"])
+    db.bulk_insert_mappings(Grade, rows["grades"])
+    db.bulk_insert_mappings(Participation, rows["parts"])
+    db.bulk_insert_mappings(SpecialPoints, rows["special"])
+    db.bulk_insert_mappings(Submission, rows["subs"])
+    db.commit()
+    return class_.id
+
+
+def per_student_grade(student_id: int, class_id: int, db) -> float:
+    """The original per-student calculation, kept here as the baseline."""
+    categories = db.query(GradeCategory).filter(GradeCategory.class_id == class_id).all()
+    all_grades = db.query(Grade).filter(
+        Grade.student_id == student_id, Grade.class_id == class_id,
+    ).all()
+
+    weighted_sum = 0.0
+    for cat in categories:
+        valid = [g for g in all_grades if g.category_id == cat.id and g.max_score and g.max_score > 0]
+        avg = (sum((g.score / g.max_score) * 100 for g in valid) / len(valid)) if valid else 0.0
+        weighted_sum += avg * cat.weight
+        for a in db.query(Assignment).filter(
+            Assignment.class_id == class_id,
+            Assignment.category_id == cat.id,
+            Assignment.published == True,
+        ).all():
+            db.query(Submission).filter(
+                Submission.assignment_id == a.id,
+                Submission.student_id == student_id,
+            ).first()
+
+    part_pts = db.query(func.sum(Participation.points)).filter(
+        Participation.student_id == student_id,
+        Participation.class_id == class_id,
+        Participation.approved == "approved",
+    ).scalar() or 0
+    sp_records = db.query(SpecialPoints).filter(
+        SpecialPoints.student_id == student_id,
+        SpecialPoints.class_id == class_id,
+    ).all()
+    sp_total = sum(sp.points_value for sp in sp_records if sp.opted_in and sp.awarded)
+    return weighted_sum + 0.1 * int(part_pts) + sp_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gradebook benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    args = parser.parse_args()
+
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    print(f"{'students':>8} {'per-student':>12} {'gradebook':>10} {'speedup':>8} {'max diff':>9}")
+    for n in args.sizes:
+        db = Session()
+        try:
+            class_id = seed(db, n)
+            student_ids = [sid for (sid,) in db.query(StudentClass.student_id).filter(
+                StudentClass.class_id == class_id
+            ).order_by(StudentClass.id).all()]
+
+            start = time.perf_counter()
+            baseline = [per_student_grade(sid, class_id, db) for sid in student_ids]
+            per_student_s = time.perf_counter() - start
+            db.expunge_all()
+
+            start = time.perf_counter()
+            finals = Gradebook.load(class_id, db, student_ids).final_grades()
+            gradebook_s = time.perf_counter() - start
+
+            max_diff = max(abs(a - b) for a, b in zip(baseline, finals))
+            print(f"{n:>8} {per_student_s:>11.3f}s {gradebook_s:>9.3f}s "
+                  f"{per_student_s / gradebook_s:>7.1f}x {max_diff:>9.1e}")
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark session token lookups per backend.
+
+Issues --tokens sessions in each backend and times --lookups random token
+resolutions (what every authenticated request pays before the Student
+query):
+  - memory:   dict lookup
+  - kv:       primary-key read from a local SQLite file
+  - database: primary-key read from auth_sessions (in-memory SQLite here)
+  - signed:   HMAC-SHA256 verification plus a primary-key read from
+              revoked_tokens (logouts shared by every worker)
+
+Usage:
+    python scripts/bench_sessions.py
+    python scripts/bench_sessions.py --tokens 10000 --lookups 100000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models.database import Base
+from models.models import Student
+from app import session_store
+from app.session_store import (
+    MemorySessionStore, DatabaseSessionStore, KeyValueSessionStore, SignedSessionStore,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session lookup benchmark")
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    # DatabaseSessionStore opens its sessions from session_store.SessionLocal
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session_store.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with session_store.SessionLocal() as db:
+        db.add_all(Student(name=f"S{i}", email=f"s{i}@bench") for i in range(args.tokens))
+        db.commit()
+        student_ids = [s.id for s in db.query(Student.id)]
+
+    tmpdir = tempfile.mkdtemp()
+    stores = {
+        "memory": MemorySessionStore(),
+        "kv": KeyValueSessionStore(os.path.join(tmpdir, "sessions.kv")),
+        "database": DatabaseSessionStore(),
+        "signed": SignedSessionStore(secret="bench-secret"),
+    }
+
+    rnd = random.Random(0)
+    print(f"{'backend':>9} {'per lookup':>11} {'lookups/s':>11}")
+    for name, store in stores.items():
+        tokens = [store.create(sid) for sid in student_ids]
+        sample = [rnd.choice(tokens) for _ in range(args.lookups)]
+        start = time.perf_counter()
+        for token in sample:
+            store.get(token)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>9} {elapsed / args.lookups * 1e6:>9.2f}us {args.lookups / elapsed:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
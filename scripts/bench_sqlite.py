@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent writers and readers on SQLite, default vs tuned profile.
+
+Seeds a SQLite file with one class (see bench_gradebook.seed), then for a
+fixed time runs writer threads saving roll calls (one attendance row per
+student, one commit, like POST /api/admin/attendance) next to reader
+threads loading the dashboard stats and roster page:
+  - default: rollback journal, sqlite3's 5s lock timeout (the previous
+    engine configuration)
+  - tuned:   SQLITE_PRAGMAS from models.database (WAL, synchronous=NORMAL,
+    busy_timeout, mmap, cache, temp_store)
+
+Each profile starts from the same seeded copy of the file.
+
+Usage:
+    python scripts/bench_sqlite.py
+    python scripts/bench_sqlite.py --writers 8 --readers 8 --seconds 10
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import statistics
+from datetime import date, timedelta
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from models.database import Base, apply_sqlite_pragmas
+from models.models import Attendance, StudentClass, StudentGradeSummary
+from app.grading import ensure_grade_summaries
+from bench_gradebook import seed
+
+
+def make_engine(path: str, tuned: bool):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    if tuned:
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+    return engine
+
+
+def run_profile(path: str, tuned: bool, class_id: int, student_ids: list,
+                writers: int, readers: int, seconds: float) -> dict:
+    engine = make_engine(path, tuned)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    stop = threading.Event()
+    lock = threading.Lock()
+    result = {"writes": 0, "reads": 0, "locked": 0, "write_times": [], "read_times": []}
+
+    def writer(n: int):
+        day = date(2026, 1, 1) + timedelta(days=1000 * n)
+        while not stop.is_set():
+            start = time.perf_counter()
+            db = Session()
+            try:
+                db.add_all([
+                    Attendance(student_id=sid, class_id=class_id, date=day, status="present")
+                    for sid in student_ids
+                ])
+                db.commit()
+                elapsed, key = time.perf_counter() - start, "writes"
+            except OperationalError:
+                db.rollback()
+                elapsed, key = None, "locked"
+            finally:
+                db.close()
+            with lock:
+                result[key] += 1
+                if elapsed is not None:
+                    result["write_times"].append(elapsed)
+            day += timedelta(days=1)
+
+    def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            db = Session()
+            try:
+                db.query(
+                    func.count(StudentGradeSummary.id),
+                    func.avg(StudentGradeSummary.final_grade),
+                ).filter(StudentGradeSummary.class_id == class_id).one()
+                db.query(StudentGradeSummary).filter(
+                    StudentGradeSummary.class_id == class_id,
+                ).order_by(StudentGradeSummary.final_grade.desc()).limit(50).all()
+                elapsed, key = time.perf_counter() - start, "reads"
+            except OperationalError:
+                elapsed, key = None, "locked"
+            finally:
+                db.close()
+            with lock:
+                result[key] += 1
+                if elapsed is not None:
+                    result["read_times"].append(elapsed)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    engine.dispose()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite default vs tuned under concurrent load")
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    pristine = os.path.join(tmp, "pristine.db")
+    engine = make_engine(pristine, tuned=False)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    class_id = seed(db, args.students)
+    ensure_grade_summaries(class_id, db)
+    student_ids = [sid for (sid,) in db.query(StudentClass.student_id).filter(StudentClass.class_id == class_id)]
+    db.close()
+    engine.dispose()
+
+    def pct(values, q):
+        return statistics.quantiles(values, n=100)[q - 1] * 1000 if len(values) > 1 else 0.0
+
+    print(f"{args.students}-student roll calls, {args.writers} writers, "
+          f"{args.readers} readers, {args.seconds:.0f}s per profile")
+    print(f"{'profile':>8} {'writes/s':>9} {'reads/s':>8} {'locked':>7} "
+          f"{'write p95':>10} {'read p95':>9}")
+    for name, tuned in (("default", False), ("tuned", True)):
+        path = os.path.join(tmp, f"{name}.db")
+        shutil.copy(pristine, path)
+        r = run_profile(path, tuned, class_id, student_ids, args.writers, args.readers, args.seconds)
+        print(f"{name:>8} {r['writes'] / args.seconds:>9.1f} {r['reads'] / args.seconds:>8.1f} "
+              f"{r['locked']:>7} {pct(r['write_times'], 95):>8.1f}ms {pct(r['read_times'], 95):>7.1f}ms")
+
+    shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Check that the class dashboard queries use the composite indexes.
+
+Builds a scratch SQLite database the way a deployment does (Alembic
+migrations, then create_all and _ensure_columns at startup), seeds a few classes (see
+bench_gradebook.seed) and runs ANALYZE, so the planner sees a class_id
+that selects a fraction of each table, as in a school with several
+classes. Then records every SELECT that
+building the dashboard issues (summaries, grade engine, activity stats,
+recent activity, student rows), runs EXPLAIN QUERY PLAN on each and fails
+if one of them scans a hot table without an index.
+
+Exits with status 1 on a full scan, so it can run in CI after a
+migration or query change.
+
+Usage:
+    python scripts/check_query_plans.py
+    python scripts/check_query_plans.py --students 200 --classes 20 --verbose
+"""
+import os
+import re
+import sys
+import argparse
+import tempfile
+from collections import defaultdict
+
+# Add project root to path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Point the app at a scratch database before models.database is imported
+DB_PATH = os.path.join(tempfile.mkdtemp(), "plans.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import event, text
+
+from models.database import Base, SessionLocal, engine
+from app.main import _ensure_columns
+from models.models import Attendance, Class, StudentClass
+from app.cache import class_version
+from app.grading import ensure_grade_summaries, get_grade_calculations
+from routes.admin import _build_dashboard, _dashboard_queries
+from bench_gradebook import seed
+
+# Tables the composite indexes were added for
+HOT_TABLES = {"attendances", "grades", "participations", "submissions", "assignments"}
+
+_SCAN_RE = re.compile(r"^SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?")
+_SEARCH_RE = re.compile(r"^SEARCH (\w+) USING (?:COVERING )?INDEX (\w+)")
+
+
+def build_schema() -> None:
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    command.upgrade(config, "head")
+    Base.metadata.create_all(bind=engine)
+    _ensure_columns()
+
+
+def dashboard_statements(class_id: int) -> list:
+    """(sql, params) of every SELECT the dashboard and grade engine issue."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    db = SessionLocal()
+    try:
+        class_ = db.get(Class, class_id)
+        version = class_version(class_)
+        ensure_grade_summaries(class_id, db)
+        _build_dashboard(class_, db)
+        student_ids = [sid for (sid,) in db.query(StudentClass.student_id).filter(
+            StudentClass.class_id == class_id
+        )]
+        get_grade_calculations(class_id, db, student_ids, version)
+        # Per-student lookups (student views, impersonation)
+        db.query(Attendance).filter(
+            Attendance.student_id == student_ids[0], Attendance.class_id == class_id,
+        ).all()
+        stats_query, rows_query = _dashboard_queries(class_id, "name", "asc", None, None, 50, 0)
+        db.execute(stats_query).one()
+        db.execute(rows_query).all()
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN the dashboard queries")
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--classes", type=int, default=8)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    build_schema()
+    db = SessionLocal()
+    class_ids = [seed(db, args.students + n) for n in range(args.classes)]
+    db.add_all([
+        Attendance(student_id=sid, class_id=cid, status="present")
+        for sid, cid in db.query(StudentClass.student_id, StudentClass.class_id)
+    ])
+    db.commit()
+    class_id = class_ids[0]
+    db.execute(text("ANALYZE"))
+    db.close()
+
+    full_scans = []
+    index_use = defaultdict(set)
+    statements = dashboard_statements(class_id)
+    with engine.connect() as conn:
+        for sql, params in statements:
+            plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params)]
+            if args.verbose:
+                print(" ".join(sql.split())[:120])
+                for line in plan:
+                    print(f"    {line}")
+            for line in plan:
+                scan, search = _SCAN_RE.match(line), _SEARCH_RE.match(line)
+                if scan and scan.group(1) in HOT_TABLES and not scan.group(2):
+                    full_scans.append((scan.group(1), " ".join(sql.split())[:120]))
+                match = search or scan
+                if match and match.group(1) in HOT_TABLES and match.group(2):
+                    index_use[match.group(1)].add(match.group(2))
+
+    print(f"{len(statements)} dashboard SELECTs checked")
+    for table in sorted(HOT_TABLES):
+        print(f"  {table:<15} {', '.join(sorted(index_use[table])) or '-'}")
+    if full_scans:
+        print("\nFull table scans:")
+        for table, sql in full_scans:
+            print(f"  {table}: {sql}")
+        sys.exit(1)
+    print("OK: no full scans of indexed tables")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Rebuild the materialized student_grade_summary table.
+
+Summaries are kept current on every grade-affecting write. Run this to
+recover from drift (manual SQL edits, restored backups, failed deploys).
+
+Usage:
+    python scripts/rebuild_grade_summaries.py               # Rebuild all classes
+    python scripts/rebuild_grade_summaries.py --class-id 3  # Rebuild one class
+"""
+import os
+import sys
+import argparse
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from models.database import SessionLocal
+from models.models import Class, StudentClass, StudentGradeSummary
+from app.cache import bump_class_version
+from app.grading import refresh_grade_summaries
+
+
+def rebuild(class_ids):
+    """Recompute summaries for the given classes and drop orphaned rows."""
+    db = SessionLocal()
+    try:
+        for class_id in class_ids:
+            enrolled = db.query(StudentClass.student_id).filter(
+                StudentClass.class_id == class_id
+            )
+            removed = db.query(StudentGradeSummary).filter(
+                StudentGradeSummary.class_id == class_id,
+                StudentGradeSummary.student_id.not_in(enrolled),
+            ).delete(synchronize_session=False)
+            summaries = refresh_grade_summaries(class_id, db)
+            # Also invalidate memoized grades and cached dashboards
+            bump_class_version(db, class_id)
+            db.commit()
+            print(f"Class {class_id}: {len(summaries)} summaries rebuilt, {removed} orphaned removed")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild student grade summaries")
+    parser.add_argument("--class-id", type=int, help="Rebuild a single class")
+    args = parser.parse_args()
+
+    try:
+        if args.class_id:
+            class_ids = [args.class_id]
+        else:
+            db = SessionLocal()
+            try:
+                class_ids = [cid for (cid,) in db.query(Class.id).all()]
+            finally:
+                db.close()
+        rebuild(class_ids)
+        print("Rebuild complete!")
+    except Exception as e:
+        print(f"Rebuild error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Soak test: session store memory over a simulated semester of logins.
+
+Drives a session store with a simulated clock: every school day each
+student logs in one to three times (new token each time, most never log
+out) and uses the session for a while. The sweeper runs every
+--sweep-minutes of simulated time. Prints the peak session count and the
+traced memory at the end of each week, first with expiry and sweeping,
+then with neither (the old behaviour) for comparison.
+
+Usage:
+    python scripts/soak_sessions.py
+    python scripts/soak_sessions.py --students 200 --weeks 18 --backend kv
+"""
+import os
+import sys
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.session_store import (
+    MemorySessionStore, KeyValueSessionStore, SESSION_MAX_AGE, SESSION_IDLE_TIMEOUT,
+)
+
+DAY = 24 * 3600
+
+
+class SimClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def simulate(store, clock: SimClock, students: int, weeks: int, sweep_every: float, sweep: bool):
+    rnd = random.Random(0)
+    rows = []
+    next_sweep = clock.now + sweep_every
+    for week in range(1, weeks + 1):
+        peak = 0
+        for day in range(7):
+            day_start = clock.now
+            if day < 5:
+                # Logins spread over the school day, each followed by a few requests
+                events = []
+                for sid in range(1, students + 1):
+                    for _ in range(rnd.randint(1, 3)):
+                        events.append((day_start + rnd.uniform(8, 16) * 3600, sid))
+                events.sort()
+                for at, sid in events:
+                    while sweep and next_sweep <= at:
+                        clock.now = next_sweep
+                        store.sweep()
+                        next_sweep += sweep_every
+                    clock.now = at
+                    token = store.create(sid)
+                    for _ in range(rnd.randint(1, 5)):
+                        clock.now += rnd.uniform(10, 300)
+                        store.get(token)
+                    if rnd.random() < 0.1:
+                        store.delete(token)
+                # End of the school day: the most sessions are alive
+                peak = max(peak, store.count())
+            clock.now = day_start + DAY
+            while sweep and next_sweep <= clock.now:
+                store.sweep()
+                next_sweep += sweep_every
+        current, _ = tracemalloc.get_traced_memory()
+        rows.append((week, peak, current))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session store soak test")
+    parser.add_argument("--students", type=int, default=120)
+    parser.add_argument("--weeks", type=int, default=18)
+    parser.add_argument("--sweep-minutes", type=float, default=15)
+    parser.add_argument("--max-count", type=int, default=10000)
+    parser.add_argument("--backend", choices=["memory", "kv"], default="memory")
+    args = parser.parse_args()
+
+    def make_store(clock, **limits):
+        if args.backend == "kv":
+            path = os.path.join(tempfile.mkdtemp(), "sessions.kv")
+            return KeyValueSessionStore(path, clock=clock, **limits)
+        return MemorySessionStore(clock=clock, **limits)
+
+    runs = [
+        ("expiry + sweeper", dict(
+            max_age=SESSION_MAX_AGE, idle_timeout=SESSION_IDLE_TIMEOUT, max_sessions=args.max_count,
+        ), True),
+        ("no expiry", dict(max_age=float("inf"), idle_timeout=float("inf"), max_sessions=10**9), False),
+    ]
+    for name, limits, sweep in runs:
+        tracemalloc.start()
+        clock = SimClock()
+        store = make_store(clock, **limits)
+        rows = simulate(store, clock, args.students, args.weeks, args.sweep_minutes * 60, sweep)
+        tracemalloc.stop()
+
+        print(f"\n{name} ({args.backend}, {args.students} students)")
+        print(f"{'week':>4} {'peak sessions':>13} {'traced KiB':>11}")
+        for week, count, mem in rows:
+            print(f"{week:>4} {count:>13} {mem / 1024:>11.0f}")
+        if sweep:
+            stats = store.stats()
+            print(f"evicted: {stats['evicted']}, sweeps: {stats['sweeps']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -154,22 +154,22 @@ async function loadGlobalStats() {
     const totalStudents = classes.reduce((sum, c) => sum + (c.student_count || 0), 0);
     document.getElementById('stat-total-students').textContent = totalStudents;
 
-    // Load pending participation count across all classes
+    // Load pending participation and averages for all classes in one request
     let pendingCount = 0;
     let totalGrades = 0;
     let gradeCount = 0;
 
-    for (const c of classes) {
-        try {
-            const dashboard = await apiCall(`/admin/classes/${c.id}/dashboard`);
-            pendingCount += dashboard.stats.pending_participation || 0;
-            if (dashboard.stats.average_grade > 0) {
-                totalGrades += dashboard.stats.average_grade;
+    try {
+        const overview = await apiCall('/admin/overview');
+        pendingCount = overview.pending_participation || 0;
+        for (const c of overview.classes) {
+            if (c.average_grade > 0) {
+                totalGrades += c.average_grade;
                 gradeCount++;
             }
-        } catch (error) {
-            console.error(`Error loading stats for class ${c.id}:`, error);
         }
+    } catch (error) {
+        console.error('Error loading overview stats:', error);
     }
 
     document.getElementById('stat-pending-participation').textContent = pendingCount;
@@ -791,8 +791,7 @@ async function openStudentModal(studentId) {
     contentEl.innerHTML = '<p class="text-center text-gray-500">Cargando...</p>';
 
     try {
-        const roster = await apiCall(`/admin/roster/${classId}`);
-        const student = roster.find(r => r.student.id === studentId);
+        const student = await apiCall(`/admin/roster/${classId}/students/${studentId}`);
 
         if (!student) {
             contentEl.innerHTML = '<p class="text-center text-red-500">Estudiante no encontrado</p>';